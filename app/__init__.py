@@ -1,9 +1,14 @@
 from flask import Flask
 from app.extensions import init_db
+from app.indexes import ensure_indexes
+from app.counters import ViewCounter
+from app.product_cache import ProductCache
+from app.transactions import transaction_stats
+from app.hashing import hashing_stats
 from app.routes.auth import bp as bp_auth
 from app.routes.users import bp as bp_users
 from app.routes.comments import bp as bp_com
-from app.routes.posts import bp as bp_post
+from app.routes.posts import bp as bp_post, new_feed_cache
 from app.routes.products import bp as bp_prod
 from app.routes.orders import bp as bp_ped
 
@@ -13,6 +18,7 @@ from app.routes.orders import bp as bp_ped
 def create_app():
     app= Flask(__name__) #__name__ dentro de __init__.py toma el nombre de la carpeta que lo contiene (app).
     db,mongo_client=init_db()#creamos la instancia de mongoDB
+    ensure_indexes(db)#crea los índices que falten (app/indexes.py)
     
     #conexiones
     app.register_blueprint(bp_auth)
@@ -24,6 +30,10 @@ def create_app():
 
     app.db=db#le pasamos como variable la base de datos a la app
     app.mongo_client=mongo_client
+    app.view_counter=ViewCounter(db.posts)#visitas agregadas en memoria, se escriben en lote
+    app.product_cache=ProductCache()#productos serializados, invalidados por un change stream
+    app.product_cache.watch(db.products)
+    app.feed_cache=new_feed_cache()#primera página del feed de posts, TTL corto
     @app.route('/')
     def index():
         return {"message": "API Tennis shop"}
@@ -36,4 +46,13 @@ def create_app():
         except Exception as e:
             return {"status": "error", "message": str(e)}, 500
     
+    @app.route('/stats')
+    def stats():
+        return {
+            "transactions": transaction_stats(),
+            "product_cache": app.product_cache.stats(),
+            "feed_cache": app.feed_cache.stats(),
+            "hashing": hashing_stats()
+        }
+    
     return app
@@ -0,0 +1,118 @@
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from bson import ObjectId
+from datetime import datetime, timezone
+
+'''
+--CARTS--
+
+One document per user in the carts collection, keyed by the user id:
+{_id: <user ObjectId>, items: [CartItem...], updated_at}
+so cart operations (and the checkout) never read or lock the user profile.
+
+Mutations are single atomic updates on the items array:
+- add:    $inc of the quantity of the line (arrayFilters on product_id + size),
+          or $push of a new line if the product/size is not in the cart yet (upsert)
+- remove: $pull of the line
+Every update returns only the projected items, the totals are computed from them.
+Two concurrent adds of the same product never lose a quantity.
+'''
+
+PROJECTION = {'items': 1, '_id': 0}
+
+
+def _line_filter(product_id, size):
+    """Cart line of a product/size (size None matches lines without size)"""
+    return {'product_id': product_id, 'size': size}
+
+
+def _user_exists(db, user_id):
+    return db.users.count_documents({'_id': ObjectId(user_id)}, limit=1) > 0
+
+
+def get_cart(db, user_id):
+    """Items of the cart of the user, or None if the user does not exist"""
+    cart = db.carts.find_one({'_id': ObjectId(user_id)}, PROJECTION)
+    if cart is not None:
+        return cart.get('items', [])
+    return [] if _user_exists(db, user_id) else None
+
+
+def add_item(db, user_id, item, max_attempts=3):
+    """
+    Add item (CartItem dict) to the cart of the user.
+    Returns (items, added) - added False if the quantity of an existing line was increased -
+    or None if the user does not exist
+    """
+    cart_filter = {'_id': ObjectId(user_id)}
+    line = _line_filter(item['product_id'], item.get('size'))
+
+    for _ in range(max_attempts):
+        # 1. Product already in the cart: increase its quantity
+        cart = db.carts.find_one_and_update(
+            {**cart_filter, 'items': {'$elemMatch': line}},
+            {
+                '$inc': {'items.$[line].quantity': item['quantity']},
+                '$set': {'updated_at': datetime.now(timezone.utc)}
+            },
+            array_filters=[{f'line.{field}': value for field, value in line.items()}],
+            projection=PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+        if cart is not None:
+            return cart['items'], False
+
+        # 2. Not in the cart: push it, creating the cart if needed
+        if not _user_exists(db, user_id):
+            return None
+        try:
+            cart = db.carts.find_one_and_update(
+                {**cart_filter, 'items': {'$not': {'$elemMatch': line}}},
+                {
+                    '$push': {'items': item},
+                    '$set': {'updated_at': datetime.now(timezone.utc)}
+                },
+                projection=PROJECTION,
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return cart['items'], True
+        except DuplicateKeyError:
+            # The cart exists and a concurrent request pushed the line first: retry the $inc
+            continue
+
+    raise Exception("Too many concurrent changes on this cart, try again")
+
+
+def remove_item(db, user_id, product_id, size=None):
+    """
+    Remove the line of product_id/size from the cart.
+    Returns the items, or None if the cart or the line does not exist
+    """
+    line = _line_filter(product_id, size)
+    cart = db.carts.find_one_and_update(
+        {'_id': ObjectId(user_id), 'items': {'$elemMatch': line}},
+        {'$pull': {'items': line}, '$set': {'updated_at': datetime.now(timezone.utc)}},
+        projection=PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+    return None if cart is None else cart['items']
+
+
+def empty_cart(db, user_id, session=None):
+    """Remove every line of the cart (also used inside the checkout transaction)"""
+    db.carts.update_one(
+        {'_id': ObjectId(user_id)},
+        {'$set': {'items': [], 'updated_at': datetime.now(timezone.utc)}},
+        session=session
+    )
+
+
+def cart_summary(items):
+    """Response body of a cart: lines and totals"""
+    total = sum(item['price'] * item['quantity'] for item in items)
+    return {
+        "cart": items,
+        "total_items": len(items),
+        "total_price": round(total, 2)
+    }
@@ -1,40 +1,317 @@
-from detoxify import Detoxify
 from confluent_kafka import Consumer, KafkaError, KafkaException
+from confluent_kafka.admin import AdminClient
+from pymongo import UpdateOne
 from datetime import datetime,timezone
 from bson import ObjectId
+import argparse
+import hashlib
 import json
+import multiprocessing
+import os
+import signal
 import time
 from app.extensions import init_db
+from app.cache import LRUCache
+from app.consumers.scorers import TOXICITY_THRESHOLD, SCORERS, load_scorer
 
-# Modelo IA
-print("Loading Detoxify model...")
-model = Detoxify('original-small')
-print("Model loaded successfully!")
-
-# MongoDB
-print("Connecting to MongoDB...")
-db, mongo_client = init_db()
-
-# Configuración del consumidor Kafka
-conf = {
-    'bootstrap.servers': 'kafka:9092',
-    'group.id': 'moderation-consumer',
-    'auto.offset.reset': 'earliest',
-    'enable.auto.commit': True
-}
-
-print("Creating Kafka consumer...")
-consumer = Consumer(conf)
-consumer.subscribe(['posts-created'])
-print(" Subscribed to topic: posts-created")
-print("\n Moderation Consumer Started - Waiting for messages...")
-
-try:
-    while True:
-        msg = consumer.poll(timeout=1.0)
-
-        if msg is None:
-            continue
+'''
+--MODERATION CONSUMER--
+
+python -m app.consumers.moderation                                  -> single-message mode (poll)
+python -m app.consumers.moderation --batch-size 32 --batch-timeout 0.5  -> micro-batch mode (consume)
+python -m app.consumers.moderation --commit-after-write                 -> manual offset commits
+python -m app.consumers.moderation --workers 4                          -> 4 consumer processes
+python -m app.consumers.moderation --backend int8                       -> int8 quantized model
+python -m app.consumers.moderation --cache-size 10000 --cache-mongo     -> verdict cache (+ Mongo)
+
+In micro-batch mode the whole batch goes through Detoxify in one forward pass
+and the verdicts are written with a single bulk_write.
+Both modes print throughput (posts/sec) so they can be compared.
+
+Writes are conditional (only posts without moderation_date) and posts that were
+already moderated are skipped before inference, so a redelivered message costs nothing.
+With --commit-after-write offsets are committed once the batch writes are
+acknowledged by MongoDB (at-least-once).
+
+With --workers N a supervisor starts N consumer processes in the same group
+(capped to the partition count of posts-created), each one loading the model
+once and limited to its own torch thread count. SIGTERM is forwarded to the
+workers, which leave the group cleanly.
+
+Verdicts are cached by a hash of the normalized title/content (bounded LRU,
+optionally backed by the moderation_cache collection with a TTL index), so
+duplicated / copy-paste posts skip inference.
+'''
+
+# Configuración por defecto (sobrescribible con argumentos)
+BOOTSTRAP_SERVERS = os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'kafka:9092')
+BATCH_SIZE = int(os.getenv('MODERATION_BATCH_SIZE', '1'))  # 1 = one message at a time
+BATCH_TIMEOUT = float(os.getenv('MODERATION_BATCH_TIMEOUT', '1.0'))  # max wait per batch (seconds)
+STATS_INTERVAL = float(os.getenv('MODERATION_STATS_INTERVAL', '30'))  # seconds between throughput reports
+COMMIT_AFTER_WRITE = os.getenv('MODERATION_COMMIT_AFTER_WRITE', 'false').lower() == 'true'
+WORKERS = int(os.getenv('MODERATION_WORKERS', '1'))
+TORCH_THREADS = int(os.getenv('MODERATION_TORCH_THREADS', '0'))  # 0 = cores / workers
+BACKEND = os.getenv('MODERATION_BACKEND', 'torch')  # see app/consumers/scorers.py
+CACHE_SIZE = int(os.getenv('MODERATION_CACHE_SIZE', '10000'))  # 0 = disabled
+CACHE_MONGO = os.getenv('MODERATION_CACHE_MONGO', 'false').lower() == 'true'
+CACHE_TTL = int(os.getenv('MODERATION_CACHE_TTL', str(7 * 24 * 3600)))  # seconds (Mongo TTL index)
+
+TOPIC = 'posts-created'
+
+# Se pone a False con SIGTERM/SIGINT para salir del bucle limpiamente
+_running = True
+
+
+def _request_stop(signum, frame):
+    global _running
+    _running = False
+
+
+# ==================== SCORING ====================
+
+def score_posts(scorer, texts):
+    """
+    Run the scorer once over a list of texts.
+    Returns one warnings dict per text (categories with rate > threshold)
+    """
+    results = scorer.predict(texts)
+    warnings_list = [{} for _ in texts]
+
+    # results es un diccionario {categoria: [rate por texto]}
+    for category, rates in results.items():
+        for i, rate in enumerate(rates):
+            if rate > TOXICITY_THRESHOLD:
+                warnings_list[i][category] = float(rate)
+
+    return warnings_list
+
+
+def moderation_update(post_id, warnings):
+    """Build the UpdateOne operation with the verdict of a post"""
+    if warnings:
+        update = {
+            'status': 'flagged',
+            'visible': False,
+            'causes': warnings,
+            'moderation_date': datetime.now(timezone.utc)
+        }
+    else:
+        update = {
+            'status': 'approved',
+            'visible': True,
+            'moderation_date': datetime.now(timezone.utc)
+        }
+
+    # Conditional: a post that already has a verdict is never overwritten
+    return UpdateOne(
+        {'_id': ObjectId(post_id), 'moderation_date': {'$exists': False}},
+        {'$set': update}
+    )
+
+
+# ==================== VERDICT CACHE ====================
+
+def content_key(event):
+    """sha256 of the normalized title + content (case and whitespace insensitive)"""
+    normalized = ' '.join(f"{event.get('title', '')}\n{event['content']}".lower().split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class VerdictCache:
+    """
+    content hash -> warnings dict.
+    Local LRU first, then (optional) the moderation_cache collection,
+    whose documents expire through a TTL index on 'date'
+    """
+
+    def __init__(self, db=None, maxsize=CACHE_SIZE, ttl=CACHE_TTL):
+        self.local = LRUCache(maxsize)
+        self.collection = db.moderation_cache if db is not None else None
+        self.mongo_hits = 0
+
+        if self.collection is not None:
+            self.collection.create_index('date', expireAfterSeconds=ttl, name='date_ttl')
+
+    def get_many(self, keys):
+        """Return {key: warnings} for the keys already moderated"""
+        found = {}
+        for key in keys:
+            warnings = self.local.get(key)
+            if warnings is not None:
+                found[key] = warnings
+
+        missing = [key for key in keys if key not in found]
+        if missing and self.collection is not None:
+            for doc in self.collection.find({'_id': {'$in': missing}}, {'warnings': 1}):
+                found[doc['_id']] = doc['warnings']
+                self.local.set(doc['_id'], doc['warnings'])
+                self.mongo_hits += 1
+
+        return found
+
+    def set_many(self, verdicts):
+        for key, warnings in verdicts.items():
+            self.local.set(key, warnings)
+
+        if verdicts and self.collection is not None:
+            self.collection.bulk_write([
+                UpdateOne(
+                    {'_id': key},
+                    {'$setOnInsert': {'warnings': warnings, 'date': datetime.now(timezone.utc)}},
+                    upsert=True
+                )
+                for key, warnings in verdicts.items()
+            ], ordered=False)
+
+    def stats(self):
+        stats = self.local.stats()
+        stats['mongo_hits'] = self.mongo_hits
+        return stats
+
+
+# ==================== PROCESSING ====================
+
+def pending_events(db, events):
+    """Drop the events whose post already has a moderation_date (redeliveries)"""
+    post_ids = [ObjectId(event['post_id']) for event in events]
+    moderated = {
+        str(post['_id'])
+        for post in db.posts.find(
+            {'_id': {'$in': post_ids}, 'moderation_date': {'$exists': True}},
+            {'_id': 1}
+        )
+    }
+
+    for event in events:
+        if event['post_id'] in moderated:
+            print(f" Post already moderated, skipping: {event['post_id']}")
+
+    return [event for event in events if event['post_id'] not in moderated]
+
+
+def process_events(scorer, db, events, cache=None):
+    """
+    Score a list of events and apply all verdicts with one bulk_write.
+    Duplicated contents (in the cache or repeated inside the batch) are scored once.
+    Returns the number of posts moderated
+    """
+    events = pending_events(db, events)
+    if not events:
+        return 0
+
+    keys = [content_key(event) for event in events]
+    verdicts = cache.get_many(keys) if cache is not None else {}
+
+    # Only the contents not seen before go through the model
+    to_score = {}
+    for key, event in zip(keys, events):
+        if key not in verdicts and key not in to_score:
+            to_score[key] = event['content']
+
+    if to_score:
+        scored = dict(zip(to_score, score_posts(scorer, list(to_score.values()))))
+        verdicts.update(scored)
+        if cache is not None:
+            cache.set_many(scored)
+
+    operations = []
+    for key, event in zip(keys, events):
+        warnings = verdicts[key]
+        print(f"post received, title: {event['title']}")
+        if warnings:
+            print(f" Toxic post detected: {list(warnings.keys())}\n")
+        else:
+            print(f" Post approved\n")
+        operations.append(moderation_update(event['post_id'], warnings))
+
+    db.posts.bulk_write(operations, ordered=False)
+    return len(events)
+
+
+# ==================== THROUGHPUT ====================
+
+class ThroughputMeter:
+    """Counts processed posts and prints posts/sec every `interval` seconds"""
+
+    def __init__(self, mode, interval=STATS_INTERVAL, cache=None):
+        self.mode = mode
+        self.interval = interval
+        self.cache = cache
+        self.total = 0
+        self._count = 0
+        self._busy = 0.0  # seconds spent scoring + writing
+        self._window_start = time.monotonic()
+
+    def record(self, posts, elapsed):
+        self.total += posts
+        self._count += posts
+        self._busy += elapsed
+
+        now = time.monotonic()
+        window = now - self._window_start
+        if window >= self.interval and self._count:
+            wall_rate = self._count / window
+            busy_rate = self._count / self._busy if self._busy else 0.0
+            print(f" [stats] mode={self.mode} posts={self._count} "
+                  f"throughput={wall_rate:.1f} posts/sec "
+                  f"(processing only: {busy_rate:.1f} posts/sec, total={self.total})")
+            if self.cache is not None:
+                print(f" [stats] verdict cache: {self.cache.stats()}")
+            self._count = 0
+            self._busy = 0.0
+            self._window_start = now
+
+
+# ==================== KAFKA ====================
+
+def build_consumer(bootstrap_servers=BOOTSTRAP_SERVERS, commit_after_write=COMMIT_AFTER_WRITE,
+                   worker_id=0):
+    """Create the Kafka consumer subscribed to posts-created"""
+    conf = {
+        'bootstrap.servers': bootstrap_servers,
+        'group.id': 'moderation-consumer',
+        'client.id': f'moderation-{worker_id}',
+        'auto.offset.reset': 'earliest',
+        # Manual mode: offsets are committed by run() after the Mongo writes
+        'enable.auto.commit': not commit_after_write
+    }
+
+    print("Creating Kafka consumer...")
+    consumer = Consumer(conf)
+
+    def on_assign(consumer, partitions):
+        print(f" [worker {worker_id}] assigned partitions: {[p.partition for p in partitions]}")
+
+    def on_revoke(consumer, partitions):
+        print(f" [worker {worker_id}] revoked partitions: {[p.partition for p in partitions]}")
+
+    consumer.subscribe([TOPIC], on_assign=on_assign, on_revoke=on_revoke)
+    print(f" Subscribed to topic: {TOPIC}")
+    return consumer
+
+
+def topic_partitions(bootstrap_servers=BOOTSTRAP_SERVERS):
+    """Number of partitions of posts-created (0 if the topic does not exist yet)"""
+    admin = AdminClient({'bootstrap.servers': bootstrap_servers})
+    metadata = admin.list_topics(topic=TOPIC, timeout=10)
+    topic = metadata.topics.get(TOPIC)
+    if topic is None or topic.error is not None:
+        return 0
+    return len(topic.partitions)
+
+
+def fetch_messages(consumer, batch_size, batch_timeout):
+    """poll() one message in single mode, consume() up to batch_size in batch mode"""
+    if batch_size <= 1:
+        msg = consumer.poll(timeout=batch_timeout)
+        return [msg] if msg is not None else []
+    return consumer.consume(num_messages=batch_size, timeout=batch_timeout)
+
+
+def decode_messages(messages):
+    """Return the decoded events, skipping/raising on Kafka errors"""
+    events = []
+    for msg in messages:
         if msg.error():
             if msg.error().code() == KafkaError.UNKNOWN_TOPIC_OR_PART:
                 print(f' Topic not available yet, waiting...')
@@ -43,44 +320,162 @@ try:
             else:
                 print(f' Kafka error: {msg.error()}')
                 raise KafkaException(msg.error())
-        else:
-            # Procesar mensaje
-            event = json.loads(msg.value().decode('utf-8'))
-            print(f"post received, title: {event['title']}")
-
-            results = model.predict(event['content'])
-            warnings = {}
-
-            # results es un diccionario, no una lista de tuplas
-            for category, rate in results.items():
-                if rate > 0.6:
-                    warnings[category] = float(rate)
-
-            if warnings:
-                print(f" Toxic post detected: {list(warnings.keys())}\n")
-                db.posts.update_one(
-                    {'_id': ObjectId(event['post_id'])},
-                    {'$set': {
-                        'status': 'flagged',
-                        'visible': False,
-                        'causes': warnings,
-                        'moderation_date': datetime.now(timezone.utc)}
-                    }
-                )
-            else:
-                print(f" Post approved\n")
-                db.posts.update_one(
-                    {'_id': ObjectId(event['post_id'])},
-                    {'$set': {
-                        'status': 'approved',
-                        'visible': True,
-                        'moderation_date': datetime.now(timezone.utc)}
-                    }
-                )
+        events.append(json.loads(msg.value().decode('utf-8')))
+    return events
+
+
+# ==================== MAIN LOOP ====================
+
+def run(batch_size=BATCH_SIZE, batch_timeout=BATCH_TIMEOUT, stats_interval=STATS_INTERVAL,
+        commit_after_write=COMMIT_AFTER_WRITE, backend=BACKEND, cache_size=CACHE_SIZE,
+        cache_mongo=CACHE_MONGO, worker_id=0):
+    signal.signal(signal.SIGTERM, _request_stop)
+
+    # Modelo IA
+    print(f"Loading Detoxify model ({backend})...")
+    scorer = load_scorer(backend)
+    print("Model loaded successfully!")
+
+    # MongoDB
+    print("Connecting to MongoDB...")
+    db, mongo_client = init_db()
+
+    cache = VerdictCache(db if cache_mongo else None, cache_size) if cache_size > 0 or cache_mongo else None
+
+    consumer = build_consumer(commit_after_write=commit_after_write, worker_id=worker_id)
+    mode = 'single' if batch_size <= 1 else f'batch({batch_size})'
+    if commit_after_write:
+        mode += ', commit-after-write'
+    meter = ThroughputMeter(mode, stats_interval, cache)
+    print(f"\n Moderation Consumer Started ({mode}) - Waiting for messages...")
+
+    try:
+        while _running:
+            messages = fetch_messages(consumer, batch_size, batch_timeout)
+            if not messages:
+                continue
+
+            events = decode_messages(messages)
+
+            start = time.monotonic()
+            processed = process_events(scorer, db, events, cache) if events else 0
+            meter.record(processed, time.monotonic() - start)
+
+            # bulk_write returned -> writes acknowledged -> safe to commit the batch
+            if commit_after_write and events:
+                consumer.commit(asynchronous=False)
+
+    except KeyboardInterrupt:
+        print("\nShutting down consumer...")
+
+    finally:
+        # close() leaves the group so the partitions are reassigned right away
+        consumer.close()
+        print(f"Consumer closed ({meter.total} posts moderated)")
+
+
+# ==================== SUPERVISOR (--workers N) ====================
+
+def _worker_main(worker_id, torch_threads, options):
+    """Entry point of each worker process"""
+    import torch
+    torch.set_num_threads(torch_threads)
+    print(f"[worker {worker_id}] pid={os.getpid()} torch threads={torch_threads}")
+    run(worker_id=worker_id, **options)
+
+
+def supervise(workers, torch_threads, options):
+    """Start N consumer processes, restart the ones that crash, stop them all on SIGTERM"""
+    partitions = topic_partitions()
+    if partitions == 0:
+        print(f" Topic {TOPIC} not found, starting {workers} workers anyway")
+    elif workers > partitions:
+        # Kafka assigns each partition to one consumer of the group: the rest would stay idle
+        print(f" {TOPIC} has {partitions} partitions, starting {partitions} workers instead of {workers}")
+        workers = partitions
+
+    if not torch_threads:
+        torch_threads = max(1, (os.cpu_count() or 1) // workers)
+
+    # spawn: each worker loads its own model instead of inheriting torch state with fork
+    ctx = multiprocessing.get_context('spawn')
+    processes = {}
+
+    def start(worker_id):
+        process = ctx.Process(
+            target=_worker_main,
+            args=(worker_id, torch_threads, options),
+            name=f'moderation-{worker_id}'
+        )
+        process.start()
+        processes[worker_id] = process
+
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+
+    print(f"Starting {workers} moderation workers ({torch_threads} torch threads each)...")
+    for worker_id in range(workers):
+        start(worker_id)
+
+    try:
+        while _running:
+            for worker_id, process in list(processes.items()):
+                if not process.is_alive() and _running:
+                    print(f" Worker {worker_id} exited with code {process.exitcode}, restarting...")
+                    start(worker_id)
+            time.sleep(1)
+    finally:
+        print("\nStopping workers...")
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()  # SIGTERM -> the worker closes its consumer
+        for process in processes.values():
+            process.join(timeout=30)
+            if process.is_alive():
+                process.kill()
+        print("All workers stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detoxify moderation consumer')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help='messages per batch (1 = single-message mode)')
+    parser.add_argument('--batch-timeout', type=float, default=BATCH_TIMEOUT,
+                        help='max seconds to wait while filling a batch')
+    parser.add_argument('--stats-interval', type=float, default=STATS_INTERVAL,
+                        help='seconds between throughput reports')
+    parser.add_argument('--commit-after-write', action='store_true', default=COMMIT_AFTER_WRITE,
+                        help='disable auto commit and commit offsets after each batch is written')
+    parser.add_argument('--backend', default=BACKEND, choices=list(SCORERS),
+                        help='scorer backend (torch = fp32, int8 = dynamic quantization)')
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE,
+                        help='verdicts kept in the local LRU cache (0 = disabled)')
+    parser.add_argument('--cache-mongo', action='store_true', default=CACHE_MONGO,
+                        help='share cached verdicts through the moderation_cache collection')
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help='number of consumer processes (capped to the topic partitions)')
+    parser.add_argument('--torch-threads', type=int, default=TORCH_THREADS,
+                        help='torch threads per worker (0 = cores / workers)')
+    args = parser.parse_args()
+
+    options = {
+        'batch_size': args.batch_size,
+        'batch_timeout': args.batch_timeout,
+        'stats_interval': args.stats_interval,
+        'commit_after_write': args.commit_after_write,
+        'backend': args.backend,
+        'cache_size': args.cache_size,
+        'cache_mongo': args.cache_mongo
+    }
+
+    if args.workers > 1:
+        supervise(args.workers, args.torch_threads, options)
+    else:
+        if args.torch_threads:
+            import torch
+            torch.set_num_threads(args.torch_threads)
+        run(**options)
+
 
-except KeyboardInterrupt:
-    print("\nShutting down consumer...")
-    
-finally:
-    consumer.close()
-    print("Consumer closed")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+from datetime import datetime, timezone
+from pymongo.errors import PyMongoError
+import argparse
+import json
+import os
+import signal
+import time
+from app.extensions import init_db, get_producer, close_producer
+from app.indexes import ensure_indexes
+
+'''
+--OUTBOX RELAY--
+
+python -m app.consumers.outbox_relay
+
+Publishes the pending events of the outbox collection (see app/outbox.py) to Kafka:
+
+1. Read up to BATCH_SIZE unpublished events (oldest first)
+2. Produce all of them and flush once (one broker round trip per batch)
+3. Mark the delivered ones as published with a single update_many
+
+Idle waits use a change stream on outbox inserts when available and fall back
+to polling. Events that fail to deliver stay pending and are retried in the next batch,
+so delivery is at-least-once (the moderation consumer ignores repeated posts).
+'''
+
+BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '500'))
+POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', '1.0'))  # seconds
+FLUSH_TIMEOUT = float(os.getenv('OUTBOX_FLUSH_TIMEOUT', '30'))  # seconds
+
+_running = True
+
+
+def _request_stop(signum, frame):
+    global _running
+    _running = False
+
+
+def publish_batch(db, producer, batch_size=BATCH_SIZE):
+    """Publish one batch of pending events. Returns (delivered, failed)"""
+    events = list(
+        db.outbox.find({'published': False}).sort('_id', 1).limit(batch_size)
+    )
+    if not events:
+        return 0, 0
+
+    delivered = []
+    failed = []
+
+    def on_delivery(event_id):
+        def callback(err, msg):
+            if err is not None:
+                print(f' Message delivery failed ({event_id}): {err}')
+                failed.append(event_id)
+            else:
+                delivered.append(event_id)
+        return callback
+
+    for event in events:
+        while True:
+            try:
+                producer.produce(
+                    event['topic'],
+                    key=event.get('key'),
+                    value=json.dumps(event['payload']).encode('utf-8'),
+                    on_delivery=on_delivery(event['_id'])
+                )
+                break
+            except BufferError:
+                # Local queue full: let it drain and retry
+                producer.poll(0.5)
+
+    remaining = producer.flush(FLUSH_TIMEOUT)
+    if remaining:
+        print(f' {remaining} events still waiting for the broker, they will be retried')
+
+    if delivered:
+        db.outbox.update_many(
+            {'_id': {'$in': delivered}},
+            {'$set': {'published': True, 'published_at': datetime.now(timezone.utc)}}
+        )
+
+    return len(delivered), len(failed)
+
+
+def _open_stream(db):
+    """Change stream on outbox inserts (None if the deployment does not support it)"""
+    try:
+        return db.outbox.watch(
+            [{'$match': {'operationType': 'insert'}}],
+            max_await_time_ms=int(POLL_INTERVAL * 1000)
+        )
+    except PyMongoError as e:
+        print(f" Change streams not available ({e}), polling every {POLL_INTERVAL}s")
+        return None
+
+
+def run(batch_size=BATCH_SIZE):
+    signal.signal(signal.SIGTERM, _request_stop)
+
+    print("Connecting to MongoDB...")
+    db, mongo_client = init_db()
+    ensure_indexes(db, ['outbox'])
+
+    producer = get_producer()
+    if producer is None:
+        raise RuntimeError("Kafka producer not available")
+
+    # The stream is opened before draining so no insert is missed in between
+    stream = _open_stream(db)
+    total = 0
+    print("\n Outbox relay started - Waiting for events...")
+
+    try:
+        while _running:
+            start = time.monotonic()
+            delivered, failed = publish_batch(db, producer, batch_size)
+            total += delivered
+
+            if delivered:
+                elapsed = time.monotonic() - start
+                print(f" Published {delivered} events ({delivered / elapsed:.0f} events/sec, total={total})")
+
+            # Full batch -> there may be more pending: keep draining
+            if delivered + failed >= batch_size:
+                continue
+            if failed:
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            # Idle: wait for the next insert (or the poll interval)
+            if stream is not None:
+                try:
+                    stream.try_next()
+                except PyMongoError as e:
+                    print(f" Change stream error: {e}")
+                    stream.close()
+                    stream = _open_stream(db)
+            else:
+                time.sleep(POLL_INTERVAL)
+
+    except KeyboardInterrupt:
+        print("\nShutting down outbox relay...")
+
+    finally:
+        if stream is not None:
+            stream.close()
+        close_producer()
+        print(f"Outbox relay closed ({total} events published)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Publish outbox events to Kafka')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help='events published per batch')
+    args = parser.parse_args()
+
+    run(args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+from detoxify import Detoxify
+import argparse
+import multiprocessing
+import resource
+import statistics
+import time
+
+'''
+--MODERATION SCORERS--
+
+Pluggable backends for the moderation consumer. Every scorer exposes
+predict(texts) -> {category: [rate per text]}, the same shape Detoxify returns for a list.
+
+torch -> Detoxify fp32 (original behaviour)
+int8  -> Detoxify with its Linear layers dynamically quantized to int8
+
+python -m app.consumers.scorers --parity      -> compare verdicts of every backend against torch
+python -m app.consumers.scorers --benchmark   -> load time, latency, throughput and RSS per backend
+'''
+
+TOXICITY_THRESHOLD = 0.6
+CHECKPOINT = 'original-small'
+
+
+# ==================== BACKENDS ====================
+
+class DetoxifyScorer:
+    """Detoxify fp32 torch model"""
+    name = 'torch'
+
+    def __init__(self, checkpoint=CHECKPOINT):
+        self.model = Detoxify(checkpoint)
+
+    def predict(self, texts):
+        return self.model.predict(texts)
+
+
+class QuantizedDetoxifyScorer(DetoxifyScorer):
+    """Detoxify with dynamic int8 quantization of the Linear layers (CPU only)"""
+    name = 'int8'
+
+    def __init__(self, checkpoint=CHECKPOINT):
+        super().__init__(checkpoint)
+        import torch
+        self.model.model = torch.quantization.quantize_dynamic(
+            self.model.model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+
+
+SCORERS = {
+    DetoxifyScorer.name: DetoxifyScorer,
+    QuantizedDetoxifyScorer.name: QuantizedDetoxifyScorer,
+}
+
+
+def load_scorer(name):
+    """Instantiate a scorer by backend name"""
+    if name not in SCORERS:
+        raise ValueError(f"Unknown scorer backend: {name} (available: {', '.join(SCORERS)})")
+    return SCORERS[name]()
+
+
+def verdicts(results, threshold=TOXICITY_THRESHOLD):
+    """Set of categories over the threshold for each text"""
+    flagged = None
+    for category, rates in results.items():
+        if flagged is None:
+            flagged = [set() for _ in rates]
+        for i, rate in enumerate(rates):
+            if rate > threshold:
+                flagged[i].add(category)
+    return flagged or []
+
+
+# ==================== PARITY CHECK ====================
+
+def sample_texts():
+    """Good and toxic posts used by the simulation script"""
+    from app.consumers.simulation import posts
+    return [f"{title}. {content}" for title, content, _ in posts] + [content for _, content, _ in posts]
+
+
+def parity(texts, backends):
+    """Compare every backend against torch: max score difference and verdict agreement"""
+    reference = DetoxifyScorer().predict(texts)
+    reference_verdicts = verdicts(reference)
+
+    for name in backends:
+        if name == DetoxifyScorer.name:
+            continue
+        results = load_scorer(name).predict(texts)
+        candidate_verdicts = verdicts(results)
+
+        max_diff = max(
+            abs(a - b)
+            for category in reference
+            for a, b in zip(reference[category], results[category])
+        )
+        mismatches = [
+            i for i, (a, b) in enumerate(zip(reference_verdicts, candidate_verdicts)) if a != b
+        ]
+
+        print(f"\n{name} vs torch ({len(texts)} texts, threshold {TOXICITY_THRESHOLD})")
+        print(f" max score difference: {max_diff:.4f}")
+        print(f" verdict agreement: {len(texts) - len(mismatches)}/{len(texts)}")
+        for i in mismatches:
+            print(f"  - {texts[i][:60]!r}: torch={sorted(reference_verdicts[i])} "
+                  f"{name}={sorted(candidate_verdicts[i])}")
+
+
+# ==================== BENCHMARK ====================
+
+def _benchmark_backend(name, texts, batch_size, rounds, queue):
+    """Runs in its own process so the RSS of each backend is measured separately"""
+    start = time.perf_counter()
+    scorer = load_scorer(name)
+    load_time = time.perf_counter() - start
+
+    # Latency: one text per call (single-message mode)
+    latencies = []
+    for _ in range(rounds):
+        for text in texts:
+            start = time.perf_counter()
+            scorer.predict([text])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    # Throughput: batches of batch_size texts (micro-batch mode)
+    batch = (texts * (batch_size // len(texts) + 1))[:batch_size]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        scorer.predict(batch)
+    throughput = rounds * len(batch) / (time.perf_counter() - start)
+
+    latencies.sort()
+    queue.put({
+        'backend': name,
+        'load_s': load_time,
+        'p50_ms': statistics.median(latencies),
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1],
+        'throughput': throughput,
+        'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,  # KB on Linux
+    })
+
+
+def benchmark(texts, backends, batch_size, rounds):
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+
+    results = []
+    for name in backends:
+        process = ctx.Process(target=_benchmark_backend, args=(name, texts, batch_size, rounds, queue))
+        process.start()
+        results.append(queue.get())
+        process.join()
+
+    print(f"\n{'backend':<8} {'load (s)':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} "
+          f"{'posts/sec (batch ' + str(batch_size) + ')':>24} {'max RSS (MB)':>13}")
+    for r in results:
+        print(f"{r['backend']:<8} {r['load_s']:>9.2f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+              f"{r['throughput']:>24.1f} {r['rss_mb']:>13.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare moderation scorer backends')
+    parser.add_argument('--parity', action='store_true', help='compare verdicts against torch')
+    parser.add_argument('--benchmark', action='store_true', help='latency, throughput and RSS per backend')
+    parser.add_argument('--backends', nargs='+', default=list(SCORERS), choices=list(SCORERS))
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    texts = sample_texts()
+    if args.parity or not args.benchmark:
+        parity(texts, args.backends)
+    if args.benchmark:
+        benchmark(texts, args.backends, args.batch_size, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
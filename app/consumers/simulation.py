@@ -60,36 +60,40 @@ posts = [
     ),
 ]
 
-user={
-    "name": "Juan Velado",
-    "email": "juan20@email.com",
-    "password": "12345678",
-    "level": "intermediate"
-}
-url_register = "http://localhost:5000/api/auth/register" 
-url_post= "http://localhost:5000/api/posts" 
+def main():
+    user={
+        "name": "Juan Velado",
+        "email": "juan20@email.com",
+        "password": "12345678",
+        "level": "intermediate"
+    }
+    url_register = "http://localhost:5000/api/auth/register" 
+    url_post= "http://localhost:5000/api/posts" 
 
-create_user= requests.post(url_register, json=user).json()
-print(f"user created:\n\n -{create_user['user']['name']}\n -{create_user['user']['email']}\n -{create_user['user']['level']}")
+    create_user= requests.post(url_register, json=user).json()
+    print(f"user created:\n\n -{create_user['user']['name']}\n -{create_user['user']['email']}\n -{create_user['user']['level']}")
 
-print('\nstarts posting...\n')
+    print('\nstarts posting...\n')
 
-for i in range(len(posts)-1,-1,-1):
+    pending = list(posts)  # the module-level list stays intact for other scripts
 
-    n=random.randint(0,i)
-    body= {
-        "author_id": create_user['user']['id'],
-        "author_name": create_user['user']['name'],
-        "type": "discussion",
-        "category": posts[n][2],
-        "title": posts[n][0],
-        "content": posts[n][1]
-    }
-    print(f"title: {posts[n][0]}\n\n{posts[n][1]}")
-    create_post= requests.post(url_post, json=body).json()
-    posts.pop(n)
-    input('\npress enter to continue posting\n')
-    print('------------------------------------------------')
+    for i in range(len(pending)-1,-1,-1):
 
+        n=random.randint(0,i)
+        body= {
+            "author_id": create_user['user']['id'],
+            "author_name": create_user['user']['name'],
+            "type": "discussion",
+            "category": pending[n][2],
+            "title": pending[n][0],
+            "content": pending[n][1]
+        }
+        print(f"title: {pending[n][0]}\n\n{pending[n][1]}")
+        create_post= requests.post(url_post, json=body).json()
+        pending.pop(n)
+        input('\npress enter to continue posting\n')
+        print('------------------------------------------------')
 
 
+if __name__ == '__main__':
+    main()
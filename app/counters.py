@@ -0,0 +1,79 @@
+from collections import defaultdict
+from pymongo import UpdateOne
+from bson import ObjectId
+import atexit
+import os
+import threading
+
+FLUSH_INTERVAL = float(os.getenv('VIEW_FLUSH_INTERVAL', '5'))  # seconds
+MAX_PENDING = int(os.getenv('VIEW_MAX_PENDING', '10000'))  # distinct ids before an early flush
+
+
+class ViewCounter:
+    """
+    Write-behind counter: increments are aggregated in memory per document id
+    and written every `interval` seconds with a single bulk_write of $inc.
+    A final flush runs when the process exits
+    """
+
+    def __init__(self, collection, field='views', interval=FLUSH_INTERVAL, max_pending=MAX_PENDING):
+        self.collection = collection
+        self.field = field
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = defaultdict(int)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+        self._thread = threading.Thread(target=self._run, name=f'{field}-counter', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def increment(self, entity_id, amount=1):
+        with self._lock:
+            self._pending[entity_id] += amount
+            if len(self._pending) >= self.max_pending:
+                self._wake.set()  # too many ids buffered: flush now
+
+    def pending(self, entity_id):
+        """Increments not written yet for this id"""
+        with self._lock:
+            return self._pending.get(entity_id, 0)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+
+        if not pending:
+            return 0
+
+        try:
+            self.collection.bulk_write([
+                UpdateOne({'_id': ObjectId(entity_id)}, {'$inc': {self.field: amount}})
+                for entity_id, amount in pending.items()
+            ], ordered=False)
+        except Exception as e:
+            # Keep the increments for the next flush
+            print(f"Error flushing {self.field}: {e}")
+            with self._lock:
+                for entity_id, amount in pending.items():
+                    self._pending[entity_id] += amount
+            return 0
+
+        return len(pending)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        """Stop the background thread and write what is left"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
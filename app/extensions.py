@@ -1,9 +1,17 @@
 import os
+import atexit
+import threading
 from pymongo import MongoClient
+from confluent_kafka import Producer
 
 mongo_client = None
 db = None
 
+producer = None
+_producer_lock = threading.Lock()
+_stop_polling = threading.Event()
+_poll_thread = None
+
 def init_db():
     global mongo_client, db
     
@@ -23,3 +31,63 @@ def init_db():
         raise
     
     return db,mongo_client
+
+
+def get_producer():
+    """
+    Shared asynchronous Kafka producer, created on first use.
+    produce() only enqueues: a background thread runs poll() to send batches and
+    serve delivery callbacks, so callers never wait for the broker.
+    Pending messages are flushed when the process exits
+    """
+    global producer, _poll_thread
+
+    with _producer_lock:
+        if producer is None:
+            try:
+                conf = {
+                    'bootstrap.servers': os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'kafka:9092'),
+                    # Espera unos ms para agrupar mensajes en lotes
+                    'linger.ms': int(os.getenv('KAFKA_LINGER_MS', '5')),
+                    'batch.num.messages': int(os.getenv('KAFKA_BATCH_NUM_MESSAGES', '1000')),
+                    # Cola local acotada: si se llena produce() lanza BufferError en vez de bloquear
+                    'queue.buffering.max.messages': int(os.getenv('KAFKA_QUEUE_MAX_MESSAGES', '10000')),
+                    'message.timeout.ms': int(os.getenv('KAFKA_MESSAGE_TIMEOUT_MS', '30000'))
+                }
+                producer = Producer(conf)
+                print(" Kafka producer connected")
+            except Exception as e:
+                print(f" Kafka not available: {e}")
+                return None
+
+            _stop_polling.clear()
+            _poll_thread = threading.Thread(target=_poll_loop, name='kafka-producer-poll', daemon=True)
+            _poll_thread.start()
+            atexit.register(close_producer)
+
+    return producer
+
+
+def _poll_loop():
+    """Serve delivery callbacks until close_producer() is called"""
+    while not _stop_polling.is_set():
+        producer.poll(0.5)
+
+
+def close_producer(timeout=10):
+    """Stop the poll thread and flush the events still in the local queue"""
+    global producer
+
+    if producer is None:
+        return
+
+    _stop_polling.set()
+    if _poll_thread is not None:
+        _poll_thread.join(timeout=2)
+
+    remaining = producer.flush(timeout)
+    if remaining:
+        print(f" Kafka producer closed with {remaining} undelivered events")
+    else:
+        print(" Kafka producer flushed")
+    producer = None
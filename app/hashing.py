@@ -0,0 +1,147 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import atexit
+import multiprocessing
+import os
+import threading
+import bcrypt
+
+'''
+--PASSWORD HASHING--
+
+bcrypt hashes/checks run in a dedicated process pool (one process per core by default)
+instead of the Flask request thread. At most HASH_MAX_PENDING operations wait or run
+at the same time: beyond that HashingOverloaded is raised and the routes answer 503,
+so a login burst can't pile up unbounded work.
+
+BCRYPT_ROUNDS is the work factor of new hashes. Stored hashes with a lower cost
+are upgraded at login (needs_rehash).
+'''
+
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+HASH_WORKERS = int(os.getenv('HASH_WORKERS', str(os.cpu_count() or 1)))
+HASH_MAX_PENDING = int(os.getenv('HASH_MAX_PENDING', str(HASH_WORKERS * 4)))
+HASH_TIMEOUT = float(os.getenv('HASH_TIMEOUT', '10'))  # seconds
+
+
+class HashingOverloaded(Exception):
+    """Too many hashing operations pending -> 503"""
+
+
+_executor = None
+_pending = 0
+_stats = {'hashes': 0, 'checks': 0, 'rehashes': 0, 'rejected': 0}
+_lock = threading.Lock()
+
+
+# ---- run in the worker processes ----
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _checkpw(password, hashed):
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+
+# ---- executor ----
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # spawn: forking a multi-threaded Flask process is not safe
+            _executor = ProcessPoolExecutor(
+                max_workers=HASH_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+
+def _done(future):
+    global _pending
+    with _lock:
+        _pending -= 1
+
+
+def _run(stat, fn, *args):
+    """Run fn in the pool and wait for its result (HashingOverloaded if the queue is full)"""
+    global _pending
+    executor = _get_executor()
+    with _lock:
+        if _pending >= HASH_MAX_PENDING:
+            _stats['rejected'] += 1
+            raise HashingOverloaded("Too many authentication requests, try again later")
+        _pending += 1
+        _stats[stat] += 1
+
+    try:
+        future = executor.submit(fn, *args)
+    except BrokenProcessPool:
+        _done(None)
+        _discard(executor)
+        raise
+    except Exception:
+        _done(None)
+        raise
+    future.add_done_callback(_done)
+    try:
+        return future.result(timeout=HASH_TIMEOUT)
+    except BrokenProcessPool:
+        # A worker died: drop the pool so the next request starts a new one
+        _discard(executor)
+        raise
+
+
+def _discard(executor):
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown():
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(shutdown)
+
+
+# ---- API ----
+
+def hash_password(password, rounds=None):
+    """bcrypt hash (str) of password with BCRYPT_ROUNDS"""
+    return _run('hashes', _hashpw, password, rounds or BCRYPT_ROUNDS)
+
+
+def check_password(password, hashed):
+    return _run('checks', _checkpw, password, hashed)
+
+
+def needs_rehash(hashed):
+    """True if the stored hash was made with a lower work factor than BCRYPT_ROUNDS"""
+    try:
+        return int(hashed.split('$')[2]) < BCRYPT_ROUNDS  # $2b$<rounds>$<salt+hash>
+    except (IndexError, ValueError):
+        return False
+
+
+def rehash_password(password):
+    with _lock:
+        _stats['rehashes'] += 1
+    return hash_password(password)
+
+
+def hashing_stats():
+    with _lock:
+        return {
+            **_stats,
+            'pending': _pending,
+            'max_pending': HASH_MAX_PENDING,
+            'workers': HASH_WORKERS,
+            'rounds': BCRYPT_ROUNDS
+        }
@@ -0,0 +1,156 @@
+from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure
+import argparse
+import os
+
+'''
+--INDEXES--
+
+Declarative registry of the indexes of every collection, shaped after the
+queries and sorts of the routes. Applied idempotently at startup (create_app)
+or from the command line:
+
+docker compose exec api python -m app.indexes             # create the indexes
+docker compose exec api python -m app.indexes --explain   # explain() plans before and after
+'''
+
+OUTBOX_PUBLISHED_TTL = int(os.getenv('OUTBOX_PUBLISHED_TTL', str(24 * 3600)))
+
+INDEXES = {
+    'users': [
+        # auth.register (duplicate check) / auth.login
+        IndexModel([('email', ASCENDING)], unique=True, name='email_unique'),
+    ],
+    'products': [
+        # list_products sort (date, _id) for keyset pagination, with and without category
+        IndexModel([('active', ASCENDING), ('date', DESCENDING), ('_id', DESCENDING)],
+                   name='active_date_id'),
+        IndexModel([('active', ASCENDING), ('category', ASCENDING), ('date', DESCENDING), ('_id', DESCENDING)],
+                   name='active_category_date_id'),
+        # brand filter on the normalized field
+        IndexModel([('active', ASCENDING), ('brand_lower', ASCENDING), ('date', DESCENDING), ('_id', DESCENDING)],
+                   name='active_brand_date_id'),
+        # search (q): relevance over name > brand > color > specifications
+        IndexModel([('name', TEXT), ('brand', TEXT), ('color', TEXT), ('search_specs', TEXT)],
+                   weights={'name': 10, 'brand': 5, 'color': 2, 'search_specs': 1},
+                   name='product_text'),
+        # equality filters first, price range last
+        IndexModel([('active', ASCENDING), ('category', ASCENDING), ('gender', ASCENDING), ('price', ASCENDING)],
+                   name='active_category_gender_price'),
+        IndexModel([('active', ASCENDING), ('gender', ASCENDING), ('price', ASCENDING)],
+                   name='active_gender_price'),
+    ],
+    'posts': [
+        # feed: keyset on (date, _id), all posts / per category / front page (visible + category)
+        IndexModel([('date', DESCENDING), ('_id', DESCENDING)], name='date_id'),
+        IndexModel([('category', ASCENDING), ('date', DESCENDING), ('_id', DESCENDING)],
+                   name='category_date_id'),
+        IndexModel([('visible', ASCENDING), ('category', ASCENDING), ('date', DESCENDING), ('_id', DESCENDING)],
+                   name='visible_category_date_id'),
+    ],
+    'comments': [
+        # comment listing (keyset on date, _id), recent comments cache and rating job (entity prefix)
+        IndexModel([('entity_type', ASCENDING), ('entity_id', ASCENDING), ('reply_to', ASCENDING),
+                    ('date', DESCENDING), ('_id', DESCENDING)],
+                   name='entity_reply_date_id'),
+        # replies of a comment (reply tree of the listing: reply_to $in)
+        IndexModel([('reply_to', ASCENDING)], name='reply_to'),
+    ],
+    'orders': [
+        # ORD-YYYY-NNNNNN must be unique (and the counter seed looks up the last one of the year)
+        IndexModel([('order_number', ASCENDING)], unique=True, name='order_number_unique'),
+    ],
+    'likes': [
+        # atomic like toggle (app/likes.py)
+        IndexModel([('entity_type', ASCENDING), ('entity_id', ASCENDING), ('user_id', ASCENDING)],
+                   unique=True, name='entity_user_unique'),
+    ],
+    'outbox': [
+        # pending events scan of the relay + expiration of published events
+        IndexModel([('published', ASCENDING), ('_id', ASCENDING)], name='published_id'),
+        IndexModel([('published_at', ASCENDING)], expireAfterSeconds=OUTBOX_PUBLISHED_TTL,
+                   name='published_at_ttl'),
+    ],
+}
+
+
+def ensure_indexes(db, collections=None):
+    """
+    Create the registered indexes (existing ones are left as they are).
+    An error in one collection (e.g. duplicated emails for the unique index)
+    is reported without stopping the rest
+    """
+    for collection_name in collections or INDEXES:
+        try:
+            db[collection_name].create_indexes(INDEXES[collection_name])
+        except OperationFailure as e:
+            print(f"Error creating indexes on {collection_name}: {e}")
+
+
+# ==================== EXPLAIN ====================
+
+# Query shapes of the routes: (collection, filter, sort)
+EXPLAIN_QUERIES = [
+    ('users', {'email': 'explain@email.com'}, None),
+    ('products', {'active': True, 'category': 'rackets', 'gender': 'unisex', 'price': {'$gte': 50, '$lte': 200}}, None),
+    ('products', {'active': True, 'gender': 'female'}, None),
+    ('products', {'active': True, 'category': 'rackets'}, [('date', DESCENDING), ('_id', DESCENDING)]),
+    ('products', {'active': True, 'brand_lower': 'wilson'}, [('date', DESCENDING), ('_id', DESCENDING)]),
+    ('products', {'active': True, '$text': {'$search': 'wilson racket'}}, None),
+    ('posts', {'category': 'technique'}, [('date', DESCENDING), ('_id', DESCENDING)]),
+    ('posts', {'visible': True, 'category': 'technique'}, [('date', DESCENDING), ('_id', DESCENDING)]),
+    ('comments', {'entity_type': 'product', 'entity_id': '000000000000000000000000', 'reply_to': None},
+     [('date', DESCENDING), ('_id', DESCENDING)]),
+    ('comments', {'reply_to': '000000000000000000000000'}, None),
+    ('orders', {'order_number': {'$regex': '^ORD-2025-'}}, [('order_number', DESCENDING)]),
+    ('likes', {'entity_type': 'post', 'entity_id': '000000000000000000000000', 'user_id': 'explain'}, None),
+    ('outbox', {'published': False}, [('_id', ASCENDING)]),
+]
+
+
+def _plan_stages(plan):
+    """IXSCAN(name) <- FETCH <- ... from a winningPlan"""
+    plan = plan.get('queryPlan', plan)  # slot based engine nests the plan
+    stage = plan['stage']
+    if stage == 'IXSCAN':
+        stage = f"IXSCAN({plan.get('indexName')})"
+    inputs = plan.get('inputStages') or ([plan['inputStage']] if 'inputStage' in plan else [])
+    children = ', '.join(_plan_stages(child) for child in inputs)
+    return f"{stage} <- {children}" if children else stage
+
+
+def explain_queries(db):
+    for collection_name, query, sort in EXPLAIN_QUERIES:
+        cursor = db[collection_name].find(query).limit(20)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = cursor.explain()
+        stats = explain.get('executionStats', {})
+        print(f" {collection_name:<9} {_plan_stages(explain['queryPlanner']['winningPlan'])}"
+              f" | docs examined: {stats.get('totalDocsExamined', '?')}"
+              f" | keys examined: {stats.get('totalKeysExamined', '?')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create the indexes of all collections')
+    parser.add_argument('--explain', action='store_true', help='print explain() plans before and after')
+    parser.add_argument('--collections', nargs='+', choices=list(INDEXES))
+    args = parser.parse_args()
+
+    from app.extensions import init_db
+    db, mongo_client = init_db()
+
+    if args.explain:
+        print("\nBEFORE")
+        explain_queries(db)
+
+    ensure_indexes(db, args.collections)
+    print("\nIndexes created")
+
+    if args.explain:
+        print("\nAFTER")
+        explain_queries(db)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from bson import ObjectId
+from datetime import datetime, timezone
+
+'''
+--LIKES--
+
+One document per (entity_type, entity_id, user_id) in the likes collection,
+protected by a unique compound index (app/indexes.py). The insert/delete on likes decides the
+toggle atomically and the entity only keeps the counter, so a hot post does
+not grow with its likers.
+
+The counter is a plain $inc outside any transaction: concurrent likers of a hot
+post are serialized on the document instead of aborting with write conflicts.
+If the process dies between the two writes the counter drifts by one until
+'python -m maintenance likes' recounts it.
+'''
+
+COLLECTIONS = {
+    'post': 'posts',
+    'comment': 'comments'
+}
+
+
+def toggle_like(db, entity_type, entity_id, user_id, max_attempts=3):
+    """
+    Give or remove the like of a user.
+    Returns (liked, likes) or None if the entity does not exist
+    """
+    like = {'entity_type': entity_type, 'entity_id': entity_id, 'user_id': user_id}
+
+    for _ in range(max_attempts):
+        try:
+            db.likes.insert_one({**like, 'date': datetime.now(timezone.utc)})
+            delta = 1
+            break
+        except DuplicateKeyError:
+            # Already liked -> remove. If another request removed it first, try again
+            if db.likes.delete_one(like).deleted_count:
+                delta = -1
+                break
+    else:
+        raise Exception("Too many concurrent changes on this like, try again")
+
+    entity = db[COLLECTIONS[entity_type]].find_one_and_update(
+        {'_id': ObjectId(entity_id)},
+        {'$inc': {'likes': delta}},
+        projection={'likes': 1, '_id': 0},
+        return_document=ReturnDocument.AFTER
+    )
+
+    if entity is None:
+        # The entity does not exist: undo the like
+        if delta == 1:
+            db.likes.delete_one(like)
+        return None
+
+    return delta == 1, entity['likes']
+
+
+def delete_likes(db, entity_type, entity_ids):
+    """Remove the likes of deleted entities"""
+    db.likes.delete_many({'entity_type': entity_type, 'entity_id': {'$in': list(entity_ids)}})
@@ -0,0 +1,28 @@
+from datetime import datetime, timezone
+
+'''
+--TRANSACTIONAL OUTBOX--
+
+Events are written to the outbox collection in the same transaction as the
+document that generates them. The relay worker (app/consumers/outbox_relay.py)
+publishes them to Kafka in batches and marks them as published.
+
+{
+    "topic": "posts-created",
+    "key": "<post_id>",
+    "payload": {...},          // event sent to Kafka
+    "date": ISODate,
+    "published": false,
+    "published_at": ISODate    // set by the relay
+}
+'''
+
+def add_event(db, topic, payload, key=None, session=None):
+    """Insert an event in the outbox (pass the session to join the caller's transaction)"""
+    return db.outbox.insert_one({
+        'topic': topic,
+        'key': key,
+        'payload': payload,
+        'date': datetime.now(timezone.utc),
+        'published': False
+    }, session=session)
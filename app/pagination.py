@@ -0,0 +1,70 @@
+from bson import json_util
+import base64
+
+'''
+--KEYSET PAGINATION--
+
+The cursor is an opaque token with the sort key values of the last document
+of the page (e.g. [date, _id]). The next page is a range query on the sort
+index instead of skip(), so every page costs the same whatever the depth.
+'''
+
+# Most recent first; _id breaks ties so the keyset order is total
+NEWEST_FIRST = [('date', -1), ('_id', -1)]
+
+
+def encode_cursor(document, sort):
+    """Cursor pointing after `document` for the sort [(field, direction), ...]"""
+    values = [document.get(field) for field, _ in sort]
+    token = json_util.dumps(values).encode('utf-8')
+    return base64.urlsafe_b64encode(token).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    """Values of the cursor (ValueError if it is not valid for this sort)"""
+    try:
+        token = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json_util.loads(token)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def keyset_filter(sort, values):
+    """
+    Filter matching the documents that come after `values` in the order `sort`:
+    (a < x) OR (a == x AND b < y) ... for descending fields ($gt for ascending).
+    Missing/null values sort lowest, so they are handled explicitly
+    """
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        prefix = {f: v for (f, _), v in zip(sort[:i], values[:i])}
+        value = values[i]
+
+        if direction < 0:
+            if value is None:
+                continue  # nothing sorts below null
+            clauses.append({**prefix, field: {'$lt': value}})
+            clauses.append({**prefix, field: None})
+        else:
+            if value is None:
+                clauses.append({**prefix, field: {'$ne': None}})
+            else:
+                clauses.append({**prefix, field: {'$gt': value}})
+
+    return {'$or': clauses} if clauses else {'_id': {'$exists': False}}
+
+
+def keyset_page(collection, query, sort, limit, projection=None):
+    """
+    One page of `query` in the order `sort`: (documents, has_next, next_cursor).
+    One extra document tells if there is a next page; the cursor is encoded from
+    the raw last document so _id keeps its type for the tie-break
+    """
+    documents = list(collection.find(query, projection).sort(sort).limit(limit + 1))
+    has_next = len(documents) > limit
+    documents = documents[:limit]
+    next_cursor = encode_cursor(documents[-1], sort) if has_next else None
+    return documents, has_next, next_cursor
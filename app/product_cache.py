@@ -0,0 +1,103 @@
+from pymongo.errors import PyMongoError
+from app.cache import LRUCache
+import json
+import os
+import threading
+import time
+
+'''
+--PRODUCT CACHE--
+
+Read-through cache of serialized product payloads:
+- items:  product_id → ProductResponse dict (view_product)
+- lists:  normalized query string → response body (list_products)
+- counts: normalized filter → count_documents (pagination totals)
+
+A change stream on products invalidates the entry of the changed product and
+all lists/counts (a change can move a product in or out of any filter).
+The TTL is only a safety net in case the change stream is down.
+'''
+
+MAX_ITEMS = int(os.getenv('PRODUCT_CACHE_SIZE', '5000'))
+MAX_LISTS = int(os.getenv('PRODUCT_LIST_CACHE_SIZE', '1000'))
+TTL = float(os.getenv('PRODUCT_CACHE_TTL', '300'))  # seconds
+
+
+def _payload_size(payload):
+    """Approximate memory of a payload: size of its JSON"""
+    return len(json.dumps(payload, default=str))
+
+
+class ProductCache:
+
+    def __init__(self, max_items=MAX_ITEMS, max_lists=MAX_LISTS, ttl=TTL):
+        self.items = LRUCache(max_items, ttl, sizeof=_payload_size)
+        self.lists = LRUCache(max_lists, ttl, sizeof=_payload_size)
+        self.counts = LRUCache(max_lists, ttl)
+        self.invalidations = 0
+        # Incremented on every invalidation: a value read from Mongo before
+        # an invalidation is not stored (it could already be stale)
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def read(self, cache, key, load):
+        """
+        Read-through: cached value of key, or load() stored in cache.
+        None results are not cached (e.g. product not found)
+        """
+        value = cache.get(key)
+        if value is None:
+            generation = self.generation
+            value = load()
+            with self._lock:
+                if value is not None and generation == self.generation:
+                    cache.set(key, value)
+        return value
+
+    # ---- invalidation ----
+
+    def invalidate(self, product_id=None):
+        """Drop one product (or all of them) and every cached list/count"""
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            if product_id is None:
+                self.items.clear()
+            else:
+                self.items.invalidate(product_id)
+            self.lists.clear()
+            self.counts.clear()
+
+    def watch(self, collection):
+        """Start the change stream thread that invalidates the cache"""
+        thread = threading.Thread(
+            target=self._watch, args=(collection,), name='product-cache-watch', daemon=True
+        )
+        thread.start()
+        return thread
+
+    def _watch(self, collection):
+        resume_token = None
+        while True:
+            try:
+                with collection.watch(resume_after=resume_token) as stream:
+                    for change in stream:
+                        resume_token = stream.resume_token
+                        if 'documentKey' in change:
+                            self.invalidate(str(change['documentKey']['_id']))
+                        else:
+                            self.invalidate()  # drop / rename / invalidate events
+            except PyMongoError as e:
+                # Changes may have been missed: start again from an empty cache
+                print(f"Product cache change stream error: {e}")
+                self.invalidate()
+                resume_token = None
+                time.sleep(5)
+
+    def stats(self):
+        return {
+            "items": self.items.stats(),
+            "lists": self.lists.stats(),
+            "counts": self.counts.stats(),
+            "invalidations": self.invalidations
+        }
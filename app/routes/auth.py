@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify, current_app
 from app.schemas.users import UserCreate, UserLogin, UserResponse
 from pydantic import ValidationError
-import bcrypt
+from app.hashing import hash_password, check_password, needs_rehash, rehash_password, HashingOverloaded
 from datetime import datetime, timezone
 
 """operacion http:
@@ -32,15 +32,12 @@ def register():
         if existing_user:
             return jsonify({"error": "The email is already registered"}), 400
         
-        # 3. Hashear la contraseña
-        hashed_password = bcrypt.hashpw(
-            user_data.password.encode('utf-8'), 
-            bcrypt.gensalt()
-        )
+        # 3. Hashear la contraseña (pool de procesos, app/hashing.py)
+        hashed_password = hash_password(user_data.password)
         
         # 4. Preparar documento para MongoDB
         user_dict = user_data.model_dump(exclude_none=True)
-        user_dict['password'] = hashed_password.decode('utf-8')
+        user_dict['password'] = hashed_password
         user_dict['date'] = datetime.now(timezone.utc)
         
         # 5. Insertar en MongoDB
@@ -59,6 +56,8 @@ def register():
         
     except ValidationError as e:
         return jsonify({"error": "invalid data", "details": e.errors()}), 400
+    except HashingOverloaded as e:
+        return _overloaded(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -81,15 +80,16 @@ def login():
         if not user:
             return jsonify({"error": "invalid credentials"}), 401
         
-        # 3. Verificar contraseña
-        password_match = bcrypt.checkpw(
-            login_data.password.encode('utf-8'),
-            user['password'].encode('utf-8')
-        )
+        # 3. Verificar contraseña (pool de procesos, app/hashing.py)
+        password_match = check_password(login_data.password, user['password'])
         
         if not password_match:
             return jsonify({"error": "invalid credentials"}), 401
         
+        # Hash con un coste menor que BCRYPT_ROUNDS: se actualiza ahora que tenemos la contraseña
+        if needs_rehash(user['password']):
+            _upgrade_hash(user, login_data.password)
+        
         # 4. Login exitoso
         user['_id'] = str(user['_id'])
         user.pop('password')  # No devolver contraseña
@@ -103,5 +103,25 @@ def login():
     
     except ValidationError as e:
         return jsonify({"error": "invalid data", "details": e.errors()}), 400
+    except HashingOverloaded as e:
+        return _overloaded(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+def _overloaded(error):
+    """503 cuando la cola de hashing está llena"""
+    response = jsonify({"error": str(error)})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+def _upgrade_hash(user, password):
+    """Guarda el hash con el coste actual (solo si nadie cambió la contraseña mientras tanto)"""
+    try:
+        current_app.db.users.update_one(
+            {"_id": user['_id'], "password": user['password']},
+            {"$set": {"password": rehash_password(password)}}
+        )
+    except HashingOverloaded:
+        pass  # se intentará en el próximo login
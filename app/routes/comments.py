@@ -1,7 +1,10 @@
 from flask import Blueprint, request, jsonify, current_app
 from app.schemas.comments import CommentCreate, CommentResponse,EntityType,LastComment
+from app.likes import toggle_like as toggle_entity_like, delete_likes
 from pydantic import ValidationError
+from pymongo import ReturnDocument
 from bson import ObjectId
+from app.pagination import NEWEST_FIRST, decode_cursor, keyset_filter, keyset_page
 from datetime import datetime, timezone
 
 
@@ -14,6 +17,7 @@ bp = Blueprint('comments', __name__, url_prefix='/api/comments')
 --COMMENTS--
 
 POST - create comment 
+GET - list comments of an entity (with replies)
 GET - view 1 specific comment
 DELETE - delete comment
 
@@ -67,24 +71,15 @@ def create_comment():
         # Insert into MongoDB
         result = current_app.db.comments.insert_one(comment_dict)
 
-        # Update comment counter in the entity
-        entity_collection.update_one(
-            {"_id": ObjectId(comment_data.entity_id)},
-            {"$inc": {"total_comments": 1}}
-        )
-        
-        # If the comment has a rating (products), recalculate average
-        if comment_data.rating and comment_data.entity_type == EntityType.product:
-            _recalculate_product_rating(comment_data.entity_id)
+        comment_dict['_id'] = str(result.inserted_id)
         
-        # Update recent comments of the entity
-        _update_recent_comments(
-            comment_data.entity_type, 
-            comment_data.entity_id
-        )
+        # One update of the entity: comment counter, rating of products and
+        # recent comments cache (only main comments are cached)
+        rating = comment_data.rating if comment_data.entity_type == EntityType.product else None
+        recent = None if comment_data.reply_to else LastComment(**comment_dict).model_dump(exclude_none=True)
+        _update_entity_counters(entity_collection, comment_data.entity_id, 1, rating, recent)
         
         # Prepare response
-        comment_dict['_id'] = str(result.inserted_id)
         comment_response = CommentResponse(**comment_dict)
         
         return jsonify({
@@ -98,6 +93,62 @@ def create_comment():
         return jsonify({"error": str(e)}), 500
 
 
+# ==================== LIST COMMENTS ====================
+
+@bp.route('', methods=['GET'])
+def list_comments():
+    """
+    GET /api/comments?entity_type=product&entity_id=507f...&cursor=&limit=20&replies=true
+    
+    Main comments of an entity, most recent first
+    - cursor: empty/absent for the first page, then the next_cursor of the previous page
+      (keyset on (date, _id), same cost at any depth)
+    - limit: comments per page (default: 20, max: 100)
+    - replies: true to nest the reply tree of the page comments under "replies"
+      (one $in query per tree level instead of one query per comment)
+    """
+    try:
+        entity_type = request.args.get('entity_type')
+        entity_id = request.args.get('entity_id', '')
+        
+        if entity_type not in [e.value for e in EntityType]:
+            return jsonify({"error": "Invalid entity type"}), 400
+        if not ObjectId.is_valid(entity_id):
+            return jsonify({"error": "Invalid entity ID"}), 400
+        
+        limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+        
+        query = {"entity_type": entity_type, "entity_id": entity_id, "reply_to": None}
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                values = decode_cursor(cursor, COMMENT_SORT)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            query.update(keyset_filter(COMMENT_SORT, values))
+        
+        documents, has_next, next_cursor = keyset_page(
+            current_app.db.comments, query, COMMENT_SORT, limit
+        )
+        
+        comments = [_comment_payload(comment) for comment in documents]
+        
+        if request.args.get('replies', 'false').lower() == 'true':
+            _attach_replies(comments)
+        
+        return jsonify({
+            "comments": comments,
+            "pagination": {
+                "limit": limit,
+                "has_next": has_next,
+                "next_cursor": next_cursor
+            }
+        }), 200
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 # ==================== VIEW COMMENT ====================
 
 @bp.route('/<comment_id>', methods=['GET'])
@@ -169,24 +220,21 @@ def delete_comment(comment_id):
         # Save info before deleting
         entity_type = comment['entity_type']
         entity_id = comment['entity_id']
-        has_rating = comment.get('rating') is not None
+        rating = comment.get('rating') if entity_type == 'product' else None
         
-        # Delete comment
+        # Delete comment (and its likes)
         current_app.db.comments.delete_one({"_id": ObjectId(comment_id)})
+        delete_likes(current_app.db, 'comment', [comment_id])
         
-        # Decrement counter in the entity
+        # Decrement counter in the entity, remove its rating and pull it from the recent comments
         entity_collection = _get_collection_by_type(entity_type)
-        entity_collection.update_one(
-            {"_id": ObjectId(entity_id)},
-            {"$inc": {"total_comments": -1}}
-        )
-        
-        # If it had a rating, recalculate average
-        if has_rating and entity_type == 'product':
-            _recalculate_product_rating(entity_id)
+        cached_id = None if comment.get('reply_to') else comment_id
+        entity = _update_entity_counters(entity_collection, entity_id, -1, rating, cached_id)
         
-        # Update recent comments
-        _update_recent_comments(entity_type, entity_id)
+        # Refill the recent comments only if the deleted comment was one of them
+        cached_ids = [cached.get('id') for cached in (entity or {}).get('comments', [])]
+        if comment_id in cached_ids:
+            _update_recent_comments(entity_type, entity_id)
         
         return jsonify({"message": "Comment deleted successfully"}), 200
     
@@ -216,41 +264,14 @@ def toggle_like(comment_id):
         if not user_id:
             return jsonify({"error": "user_id is required"}), 400
         
-        # Search for comment
-        comment = current_app.db.comments.find_one({"_id": ObjectId(comment_id)})
+        # Atomic toggle on the likes collection + $inc of the counter
+        result = toggle_entity_like(current_app.db, 'comment', comment_id, user_id)
         
-        if not comment:
+        if result is None:
             return jsonify({"error": "Comment not found"}), 404
         
-        # Check if the user already liked it
-        # For this we need an array of users who liked
-        # We'll use a separate collection or a field in the comment
-        
-        # Option: Use a 'liked_by_users' array in the comment
-        liked_by_users = comment.get('liked_by_users', [])
-        
-        if user_id in liked_by_users:
-            # Remove like
-            current_app.db.comments.update_one(
-                {"_id": ObjectId(comment_id)},
-                {
-                    "$pull": {"liked_by_users": user_id},
-                    "$inc": {"likes": -1}
-                }
-            )
-            message = "Like removed"
-            new_likes = comment['likes'] - 1
-        else:
-            # Give like
-            current_app.db.comments.update_one(
-                {"_id": ObjectId(comment_id)},
-                {
-                    "$addToSet": {"liked_by_users": user_id},
-                    "$inc": {"likes": 1}
-                }
-            )
-            message = "Like added"
-            new_likes = comment['likes'] + 1
+        liked, new_likes = result
+        message = "Like added" if liked else "Like removed"
         
         return jsonify({
             "message": message,
@@ -263,6 +284,44 @@ def toggle_like(comment_id):
 
 # ==================== HELPER FUNCTIONS ====================
 
+RECENT_COMMENTS = 5  # Size of the recent comments cache embedded in posts/products
+
+COMMENT_SORT = NEWEST_FIRST
+
+MAX_REPLY_DEPTH = 10  # Levels of replies loaded by list_comments
+
+
+def _comment_payload(comment):
+    """Comment document → response dict"""
+    comment['_id'] = str(comment['_id'])
+    return CommentResponse(**comment).model_dump(exclude_none=True)
+
+
+def _attach_replies(comments, max_depth=MAX_REPLY_DEPTH):
+    """
+    Nest the replies of `comments` (in place) under "replies", oldest first.
+    Breadth first: one reply_to $in query per level of the tree.
+    ($graphLookup can't be used: reply_to stores the parent _id as a string)
+    """
+    level = comments
+    for _ in range(max_depth):
+        if not level:
+            break
+        parents = {comment['id']: comment for comment in level}
+        for comment in level:
+            comment['replies'] = []
+        
+        replies = current_app.db.comments.find(
+            {"reply_to": {"$in": list(parents)}}
+        ).sort([('date', 1), ('_id', 1)])
+        
+        level = []
+        for reply in replies:
+            payload = _comment_payload(reply)
+            parents[payload['reply_to']]['replies'].append(payload)
+            level.append(payload)
+
+
 def _get_collection_by_type(entity_type: str):
     """Get MongoDB collection based on entity type"""
     collections = {
@@ -272,51 +331,77 @@ def _get_collection_by_type(entity_type: str):
     return collections.get(entity_type)
 
 
-def _recalculate_product_rating(product_id: str):
-    """Recalculate the average rating of a product"""
-    try:
-        # Aggregate all comments with rating for the product
-        pipeline = [
-            {
-                "$match": {
-                    "entity_type": "product",
-                    "entity_id": product_id,
-                    "rating": {"$ne": None}
-                }
-            },
-            {
-                "$group": {
-                    "_id": None,
-                    "average": {"$avg": "$rating"},
-                    "total": {"$sum": 1}
-                }
-            }
-        ]
-        
-        result = list(current_app.db.comments.aggregate(pipeline))
-        
-        if result:
-            average = round(result[0]['average'], 2)
-            total = result[0]['total']
-        else:
-            average = None
-            total = 0
-        
-        # Update product
-        current_app.db.products.update_one(
-            {"_id": ObjectId(product_id)},
-            {
-                "$set": {
-                    "average_rating": average,
-                    "total_ratings": total
-                }
-            }
+def _update_entity_counters(entity_collection, entity_id: str, delta: int, rating=None, recent=None):
+    """
+    Add (delta=1) or remove (delta=-1) one comment from the entity in a single update:
+    - $inc total_comments
+    - rated comments also $inc rating_sum / total_ratings, so the rating is kept
+      incrementally instead of aggregating every comment of the product
+    - recent comments cache: on insert `recent` is the LastComment dict, $pushed keeping
+      the 5 newest ($sort + $slice); on delete it is the comment id, $pulled from the array
+    
+    Returns the entity as it was BEFORE the update (rating counters and cached comment ids)
+    """
+    increments = {"total_comments": delta}
+    if rating is not None:
+        increments["rating_sum"] = delta * rating
+        increments["total_ratings"] = delta
+    
+    update = {"$inc": increments}
+    if recent is not None and delta > 0:
+        update["$push"] = {"comments": {
+            "$each": [recent],
+            "$sort": {"date": -1},
+            "$slice": RECENT_COMMENTS
+        }}
+    elif recent is not None:
+        update["$pull"] = {"comments": {"id": recent}}
+    
+    entity = entity_collection.find_one_and_update(
+        {"_id": ObjectId(entity_id)},
+        update,
+        projection={"rating_sum": 1, "total_ratings": 1, "comments.id": 1},
+        return_document=ReturnDocument.BEFORE
+    )
+    
+    if entity and rating is not None:
+        if entity.get('total_ratings', 0) > 0 and 'rating_sum' not in entity:
+            # Legacy product (ratings from the old full recompute): the $inc started
+            # rating_sum from 0, so drop it again and keep the old average until the
+            # ratings job rebuilds the counters
+            entity_collection.update_one({"_id": entity['_id']}, {"$unset": {"rating_sum": ""}})
+            print(f"Product {entity['_id']} has no rating_sum: run 'python -m maintenance ratings'")
+            return entity
+        
+        # The update is atomic: counters after it = counters before + increments
+        _set_average_rating(
+            entity_collection,
+            entity['_id'],
+            entity.get('rating_sum', 0) + increments["rating_sum"],
+            entity.get('total_ratings', 0) + increments["total_ratings"]
         )
-    except Exception as e:
-        print(f"Error recalculating rating: {e}")
+    
+    return entity
+
+
+def _set_average_rating(entity_collection, entity_id, rating_sum, total):
+    """
+    Derive average_rating from the counters left by the $inc.
+    The filter on the counters skips the $set if another comment changed them
+    in between (that request sets the average of the newer values)
+    """
+    average = round(rating_sum / total, 2) if total > 0 else None
+    
+    entity_collection.update_one(
+        {"_id": entity_id, "rating_sum": rating_sum, "total_ratings": total},
+        {"$set": {"average_rating": average}}
+    )
 
 def _update_recent_comments(entity_type: str, entity_id: str):
-    """Update the cache of recent comments in the entity"""
+    """
+    Rebuild the cache of recent comments in the entity.
+    Only needed when a cached comment is deleted (inserts $push into the cache)
+    """
     try:
         # Get the 5 most recent comments (only main ones)
         comments_cursor = current_app.db.comments.find(
@@ -325,7 +410,7 @@ def _update_recent_comments(entity_type: str, entity_id: str):
                 "entity_id": entity_id,
                 "reply_to": None  # Only main comments
             }
-        ).sort("date", -1).limit(5)
+        ).sort("date", -1).limit(RECENT_COMMENTS)
         
         # Convert to RecentComment using Pydantic
         recent_comments = []
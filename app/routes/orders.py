@@ -1,8 +1,12 @@
 from flask import Blueprint, request, jsonify, current_app
 from app.schemas.orders import OrderCreate, OrderResponse
 from pydantic import ValidationError
+from pymongo import UpdateOne
 from bson import ObjectId
 from datetime import datetime, timezone
+from app.sequences import next_value
+from app.transactions import run_transaction
+from app.carts import empty_cart
 
 # Create blueprint for orders
 bp = Blueprint('orders', __name__, url_prefix='/api/orders')
@@ -43,10 +47,12 @@ def create_order():
     }
     
     IMPORTANT: Uses ACID transactions to guarantee:
-    1. Order is created
-    2. Product stock is reduced
+    1. Product stock is reduced (only if there is enough)
+    2. Order is created
     3. User's cart is emptied
     If ANY operation fails → Complete ROLLBACK
+    Transient errors (concurrent purchases of the same product) are retried
+    with backoff (app/transactions.py)
     """
     try:
         # Validate data with Pydantic
@@ -56,105 +62,40 @@ def create_order():
         if not ObjectId.is_valid(order_data.user_id):
             return jsonify({"error": "Invalid user ID"}), 400
         
-        user = current_app.db.users.find_one({"_id": ObjectId(order_data.user_id)})
+        user = current_app.db.users.find_one({"_id": ObjectId(order_data.user_id)}, {"_id": 1})
         if not user:
             return jsonify({"error": "User not found"}), 404
         
-        # Validate that all products exist and have sufficient stock
-        validation = _validate_product_stock(order_data.items)
-        if not validation["valid"]:
-            return jsonify({"error": validation["message"]}), 400
+        for item in order_data.items:
+            if not ObjectId.is_valid(item.product_id):
+                return jsonify({"error": f"Invalid product ID: {item.product_id}"}), 400
+        
+        # Reserve the order number outside the transaction (atomic counter,
+        # so concurrent checkouts don't conflict on it)
+        order_number = _generate_order_number()
         
         # ==================== START ACID TRANSACTION ====================
-        # Start MongoDB session for transaction
-        session = current_app.mongo_client.start_session()
+        def checkout(session):
+            # 1. REDUCE PRODUCT STOCK
+            # One $in read of all the products + one bulk_write of conditional decrements
+            _reduce_stock(order_data.items, session)
+            
+            # 2. CREATE ORDER
+            order_dict = order_data.model_dump(exclude_none=True)
+            order_dict['order_number'] = order_number
+            order_dict['order_date'] = datetime.now(timezone.utc)
+            
+            # Insert order (within transaction)
+            result = current_app.db.orders.insert_one(order_dict, session=session)
+            
+            # 3. EMPTY USER'S CART (small carts document, the profile is not touched)
+            empty_cart(current_app.db, order_data.user_id, session=session)
+            
+            return result.inserted_id
         
-        try:
-            with session.start_transaction():
-                # 1. CREATE ORDER
-                order_dict = order_data.model_dump(exclude_none=True)
-                order_dict['order_number'] = _generate_order_number()
-                order_dict['order_date'] = datetime.now(timezone.utc)
-                
-                # Insert order (within transaction)
-                result = current_app.db.orders.insert_one(order_dict, session=session)
-                order_id = result.inserted_id
-                
-                # 2. REDUCE PRODUCT STOCK
-                for item in order_data.items:
-                    # Validate product ObjectId
-                    if not ObjectId.is_valid(item.product_id):
-                        raise Exception(f"Invalid product ID: {item.product_id}")
-                    
-                    product = current_app.db.products.find_one(
-                        {"_id": ObjectId(item.product_id)},
-                        session=session
-                    )
-                    
-                    if not product:
-                        raise Exception(f"Product not found: {item.name}")
-                    
-                    # Reduce stock according to type
-                    if item.size:
-                        # Product with sizes
-                        if 'stocks' not in product:
-                            raise Exception(f"Product {item.name} has no sizes defined")
-                        
-                        # Find the size and reduce stock
-                        size_found = False
-                        for stock_item in product.get('stocks', []):
-                            if stock_item['size'] == item.size:
-                                new_stock = stock_item['stock'] - item.quantity
-                                if new_stock < 0:
-                                    raise Exception(
-                                        f"Insufficient stock for {item.name} size {item.size}"
-                                    )
-                                
-                                # Update stock for specific size
-                                current_app.db.products.update_one(
-                                    {
-                                        "_id": ObjectId(item.product_id),
-                                        "stocks.size": item.size
-                                    },
-                                    {"$set": {"stocks.$.stock": new_stock}},
-                                    session=session
-                                )
-                                size_found = True
-                                break
-                        
-                        if not size_found:
-                            raise Exception(
-                                f"Size {item.size} not found for {item.name}"
-                            )
-                    else:
-                        # Product with simple stock
-                        current_stock = product.get('stock', 0)
-                        new_stock = current_stock - item.quantity
-                        
-                        if new_stock < 0:
-                            raise Exception(f"Insufficient stock for {item.name}")
-                        
-                        # Update simple stock
-                        current_app.db.products.update_one(
-                            {"_id": ObjectId(item.product_id)},
-                            {"$set": {"stock": new_stock}},
-                            session=session
-                        )
-                
-                # 3. EMPTY USER'S CART
-                current_app.db.users.update_one(
-                    {"_id": ObjectId(order_data.user_id)},
-                    {"$set": {"cart": []}},
-                    session=session
-                )
-                
-                # If we get here, everything OK → Automatic COMMIT when exiting the with
-                
-        except Exception as e:
-            # If anything fails → Automatic ROLLBACK
-            raise e
-        finally:
-            session.end_session()
+        # COMMIT if everything OK, ROLLBACK if anything fails.
+        # Write conflicts with other checkouts (TransientTransactionError) are retried
+        order_id = run_transaction(current_app.mongo_client, checkout)
         
         # ==================== END TRANSACTION ====================
         
@@ -171,6 +112,8 @@ def create_order():
         
     except ValidationError as e:
         return jsonify({"error": "Invalid data", "details": e.errors()}), 400
+    except StockError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -207,70 +150,83 @@ def view_order(order_id):
 
 # ==================== HELPER FUNCTIONS ====================
 
-def _validate_product_stock(items):
+class StockError(Exception):
+    """Problem with the items of the order (product, size or stock) -> 400"""
+
+
+def _reduce_stock(items, session):
     """
-    Validate that all products exist and have sufficient stock
-    BEFORE starting the transaction
+    Reduce the stock of all the items inside the checkout transaction:
+    1. One find with $in to check that products exist, are active and have the size
+    2. One bulk_write of conditional decrements ({"stock": {"$gte": qty}})
+    If fewer products match than items there was not enough stock → StockError (ROLLBACK)
     """
+    product_ids = list({ObjectId(item.product_id) for item in items})
+    products = {
+        str(product['_id']): product
+        for product in current_app.db.products.find(
+            {"_id": {"$in": product_ids}},
+            {"active": 1, "stock": 1, "stocks": 1},
+            session=session
+        )
+    }
+    
+    requested = {}  # (product_id, size) -> total quantity
+    operations = []
+    
     for item in items:
-        # Validate ObjectId
-        if not ObjectId.is_valid(item.product_id):
-            return {
-                "valid": False,
-                "message": f"Invalid product ID: {item.product_id}"
-            }
-        
-        # Search for product
-        product = current_app.db.products.find_one({"_id": ObjectId(item.product_id)})
+        product = products.get(item.product_id)
         
         if not product:
-            return {
-                "valid": False,
-                "message": f"Product not found: {item.name}"
-            }
+            raise StockError(f"Product not found: {item.name}")
         
         # Verify that it's active
         if not product.get('active', True):
-            return {
-                "valid": False,
-                "message": f"Product {item.name} is no longer available"
-            }
+            raise StockError(f"Product {item.name} is no longer available")
+        
+        key = (item.product_id, item.size)
+        requested[key] = requested.get(key, 0) + item.quantity
         
         # Verify stock according to type
         if item.size:
             # Product with sizes
             if 'stocks' not in product:
-                return {
-                    "valid": False,
-                    "message": f"Product {item.name} has no sizes defined"
-                }
+                raise StockError(f"Product {item.name} has no sizes defined")
             
-            size_found = False
-            for stock_item in product.get('stocks', []):
-                if stock_item['size'] == item.size:
-                    if stock_item['stock'] < item.quantity:
-                        return {
-                            "valid": False,
-                            "message": f"Insufficient stock for {item.name} size {item.size}. Available: {stock_item['stock']}"
-                        }
-                    size_found = True
-                    break
+            available = next(
+                (s['stock'] for s in product['stocks'] if s['size'] == item.size), None
+            )
+            if available is None:
+                raise StockError(f"Size {item.size} not available for {item.name}")
+            if available < requested[key]:
+                raise StockError(
+                    f"Insufficient stock for {item.name} size {item.size}. Available: {available}"
+                )
             
-            if not size_found:
-                return {
-                    "valid": False,
-                    "message": f"Size {item.size} not available for {item.name}"
-                }
+            operations.append(UpdateOne(
+                {
+                    "_id": product['_id'],
+                    "stocks": {"$elemMatch": {"size": item.size, "stock": {"$gte": item.quantity}}}
+                },
+                {"$inc": {"stocks.$[s].stock": -item.quantity}},
+                array_filters=[{"s.size": item.size}]
+            ))
         else:
             # Product with simple stock
-            current_stock = product.get('stock', 0)
-            if current_stock < item.quantity:
-                return {
-                    "valid": False,
-                    "message": f"Insufficient stock for {item.name}. Available: {current_stock}"
-                }
+            available = product.get('stock', 0)
+            if available < requested[key]:
+                raise StockError(f"Insufficient stock for {item.name}. Available: {available}")
+            
+            operations.append(UpdateOne(
+                {"_id": product['_id'], "stock": {"$gte": item.quantity}},
+                {"$inc": {"stock": -item.quantity}}
+            ))
     
-    return {"valid": True, "message": ""}
+    result = current_app.db.products.bulk_write(operations, ordered=True, session=session)
+    
+    # The conditions protect the stock even if it changed after the read
+    if result.matched_count < len(operations):
+        raise StockError("Insufficient stock for one or more products")
 
 
 def _generate_order_number():
@@ -278,19 +234,25 @@ def _generate_order_number():
     Generate unique order number
     Format: ORD-YYYY-NNNNNN
     Example: ORD-2025-000123
+    
+    The number comes from the yearly counter document orders-YYYY (app/sequences.py):
+    one atomic $inc instead of counting the orders of the year
     """
     year = datetime.now().year
+    prefix = f"ORD-{year}-"
     
-    # Count orders from current year
-    year_start = datetime(year, 1, 1, tzinfo=timezone.utc)
-    orders_year = current_app.db.orders.count_documents({
-        "order_date": {"$gte": year_start}
-    })
+    def last_order_number():
+        # Only when the counter does not exist yet: continue after the existing orders
+        last_order = current_app.db.orders.find_one(
+            {"order_number": {"$regex": f"^{prefix}"}},
+            {"order_number": 1},
+            sort=[("order_number", -1)]
+        )
+        return int(last_order['order_number'][len(prefix):]) if last_order else 0
     
-    # Increment counter
-    number = orders_year + 1
+    number = next_value(current_app.db, f"orders-{year}", initial=last_order_number)
     
     # Format: ORD-2025-000123
-    order_number = f"ORD-{year}-{number:06d}"
+    order_number = f"{prefix}{number:06d}"
     
-    return order_number
\ No newline at end of file
+    return order_number
@@ -1,10 +1,14 @@
 from flask import Blueprint, request, jsonify, current_app
-from app.schemas.posts import PostCreate, PostResponse, PostUpdate
+from app.schemas.posts import PostCreate, PostResponse, PostUpdate, PostSummary, PostType, PostCategory
 from pydantic import ValidationError
 from bson import ObjectId
 from datetime import datetime, timezone
-from confluent_kafka import Producer
-import json
+from app.outbox import add_event
+from app.transactions import run_transaction
+from app.likes import toggle_like as toggle_entity_like, delete_likes
+from app.pagination import NEWEST_FIRST, decode_cursor, keyset_filter, keyset_page
+from app.cache import LRUCache
+import os
 
 # Create blueprint for posts
 bp = Blueprint('posts', __name__, url_prefix='/api/posts')
@@ -13,37 +17,14 @@ bp = Blueprint('posts', __name__, url_prefix='/api/posts')
 --POSTS--
 
 POST - create post 
-GET - view posts
+GET - feed of posts (summaries)
+GET - view post
 PUT - update post
 DELETE - delete post
 
 POST - give like post
 
 '''
-_producer = None
-
-def get_producer():
-    """Only when needed"""
-    global _producer
-    if _producer is None:
-        try:
-            conf = {'bootstrap.servers': 'kafka:9092'}
-            _producer = Producer(conf)
-            print(" Kafka producer connected")
-        except Exception as e:
-            print(f" Kafka not available: {e}")
-            return None
-
-    return _producer
-
-def delivery_report(err, msg):
-    """Callback para confirmar entrega de mensajes"""
-    if err is not None:
-        print(f' Message delivery failed: {err}')
-    else:
-        print(f' Message delivered to {msg.topic()} [{msg.partition()}]')
-
-
 # ==================== CREATE POST ====================
 
 @bp.route('', methods=['POST'])
@@ -74,38 +55,30 @@ def create_post():
         post_dict['comments'] = []
         post_dict['total_comments'] = 0
         
-        # Insert into MongoDB
+        # Insert post + event in the same transaction (transactional outbox):
+        # the relay worker publishes the event to Kafka, the request never talks to the broker
         print("inserting new post...")
-        result = current_app.db.posts.insert_one(post_dict)
-        
-        producer=get_producer()
-        print("creating event...")
-        event = {
-            #for moderation
-            'post_id': str(result.inserted_id),
-            'content': post_data.content,
-            'title':post_data.title,
-
-            #for stats
-            'author_id': post_data.author_id,
-            'category': post_data.category,
-            'type':post_data.type,
-            'timestamp': post_dict['date'].isoformat()
-        }
+        def insert_post(session):
+            post_dict.pop('_id', None)  # a retried attempt gets a new id
+            result = current_app.db.posts.insert_one(post_dict, session=session)
+
+            event = {
+                #for moderation
+                'post_id': str(result.inserted_id),
+                'content': post_data.content,
+                'title':post_data.title,
+
+                #for stats
+                'author_id': post_data.author_id,
+                'category': post_data.category,
+                'type':post_data.type,
+                'timestamp': post_dict['date'].isoformat()
+            }
+            add_event(current_app.db, 'posts-created', event, key=event['post_id'], session=session)
+            return result
+
+        result = run_transaction(current_app.mongo_client, insert_post)
 
-        try:
-            # Serializar el evento a JSON
-            message_value = json.dumps(event).encode('utf-8')
-            producer.produce(
-                'posts-created',
-                value=message_value,
-                callback=delivery_report
-            )
-            producer.flush()
-            print(f" Message sent to Kafka: {event['post_id']}")
-        except Exception as e:
-            print(f" Kafka error: {e}")
-            
         # Prepare response
         post_dict['_id'] = str(result.inserted_id)
         post_response = PostResponse(**post_dict)
@@ -121,6 +94,68 @@ def create_post():
         return jsonify({"error": str(e)}), 500
 
 
+# ==================== FEED ====================
+
+@bp.route('', methods=['GET'])
+def list_posts():
+    """
+    GET /api/posts?category=technique&type=discussion&status=approved&visible=true&cursor=&limit=20
+    
+    Feed of posts, most recent first. Returns summaries (PostSummary):
+    no content, no embedded comments
+    - category / type / status / visible: optional filters
+    - cursor: empty/absent for the first page, then the next_cursor of the previous page
+      (keyset on (date, _id))
+    - limit: posts per page (default: 20, max: 100)
+    
+    The first page of each filter combination is cached for FEED_CACHE_TTL seconds
+    """
+    try:
+        filter_query = {}
+        
+        category = request.args.get('category')
+        if category:
+            if category not in [c.value for c in PostCategory]:
+                return jsonify({"error": "Invalid category"}), 400
+            filter_query['category'] = category
+        
+        post_type = request.args.get('type')
+        if post_type:
+            if post_type not in [t.value for t in PostType]:
+                return jsonify({"error": "Invalid type"}), 400
+            filter_query['type'] = post_type
+        
+        status = request.args.get('status')
+        if status:
+            filter_query['status'] = status
+        
+        visible = request.args.get('visible')
+        if visible:
+            filter_query['visible'] = visible.lower() == 'true'
+        
+        limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+        
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                values = decode_cursor(cursor, FEED_SORT)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            return jsonify(_load_feed({**filter_query, **keyset_filter(FEED_SORT, values)}, limit)), 200
+        
+        # First page: short-lived cache (front page of each category)
+        cache_key = (tuple(sorted(filter_query.items())), limit)
+        body = current_app.feed_cache.get(cache_key)
+        if body is None:
+            body = _load_feed(filter_query, limit)
+            current_app.feed_cache.set(cache_key, body)
+        
+        return jsonify(body), 200
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 # ==================== VIEW POST DETAILS ====================
 
 @bp.route('/<post_id>', methods=['GET'])
@@ -128,30 +163,33 @@ def view_post(post_id):
     """
     GET /api/posts/:post_id
     View complete details of a post and increment view counter
+    
+    The read is a plain find_one: the view is buffered in memory and written
+    in batches by app.view_counter (see app/counters.py)
     """
     try:
         # Validate ObjectId
         if not ObjectId.is_valid(post_id):
             return jsonify({"error": "Invalid post ID"}), 400
         
-        # Find post and increment views
-        post = current_app.db.posts.find_one_and_update(
-            {"_id": ObjectId(post_id)},
-            {"$inc": {"views": 1}},
-            return_document=True  # Returns the updated document
-        )
+        # Find post
+        post = current_app.db.posts.find_one({"_id": ObjectId(post_id)})
         
         if not post:
             return jsonify({"error": "Post not found"}), 404
         
+        # Count the view (write-behind)
+        current_app.view_counter.increment(post_id)
+        
         # Convert _id to string
         post['_id'] = str(post['_id'])
         
         # Add default fields if they don't exist
         post.setdefault('comments', [])
         post.setdefault('total_comments', 0)
-        post.setdefault('views', 1)  # Already incremented above
         post.setdefault('likes', 0)
+        # Stored views + the ones still buffered (including this one)
+        post['views'] = post.get('views', 0) + current_app.view_counter.pending(post_id)
         
         # Validate with Pydantic
         post_response = PostResponse(**post)
@@ -290,11 +328,19 @@ def delete_post(post_id):
         # Delete post
         current_app.db.posts.delete_one({"_id": ObjectId(post_id)})
         
-        # Optional: Also delete all comments from the post
+        # Optional: Also delete all comments from the post (and the likes)
+        comment_ids = [
+            str(comment['_id'])
+            for comment in current_app.db.comments.find(
+                {"entity_type": "post", "entity_id": post_id}, {"_id": 1}
+            )
+        ]
         current_app.db.comments.delete_many({
             "entity_type": "post",
             "entity_id": post_id
         })
+        delete_likes(current_app.db, 'post', [post_id])
+        delete_likes(current_app.db, 'comment', comment_ids)
         
         return jsonify({"message": "Post deleted successfully"}), 200
     
@@ -321,37 +367,14 @@ def toggle_like(post_id):
         if not user_id:
             return jsonify({"error": "user_id is required"}), 400
         
-        # Find post
-        post = current_app.db.posts.find_one({"_id": ObjectId(post_id)})
+        # Atomic toggle on the likes collection + $inc of the counter
+        result = toggle_entity_like(current_app.db, 'post', post_id, user_id)
         
-        if not post:
+        if result is None:
             return jsonify({"error": "Post not found"}), 404
         
-        # Check if the user already liked it
-        liked_by_users = post.get('liked_by_users', [])
-        
-        if user_id in liked_by_users:
-            # Remove like
-            current_app.db.posts.update_one(
-                {"_id": ObjectId(post_id)},
-                {
-                    "$pull": {"liked_by_users": user_id},
-                    "$inc": {"likes": -1}
-                }
-            )
-            message = "Like removed"
-            new_likes = post.get('likes', 0) - 1
-        else:
-            # Give like
-            current_app.db.posts.update_one(
-                {"_id": ObjectId(post_id)},
-                {
-                    "$addToSet": {"liked_by_users": user_id},
-                    "$inc": {"likes": 1}
-                }
-            )
-            message = "Like added"
-            new_likes = post.get('likes', 0) + 1
+        liked, new_likes = result
+        message = "Like added" if liked else "Like removed"
         
         return jsonify({
             "message": message,
@@ -360,3 +383,39 @@ def toggle_like(post_id):
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+# ==================== HELPER FUNCTIONS ====================
+
+FEED_SORT = NEWEST_FIRST
+
+# Only the fields of PostSummary are read (no content, comments or legacy liked_by_users)
+FEED_PROJECTION = {field: 1 for field in PostSummary.model_fields if field != 'id'}
+
+FEED_CACHE_TTL = float(os.getenv('FEED_CACHE_TTL', '5'))  # seconds
+
+
+def new_feed_cache():
+    """Cache of the first feed page per filter (app.feed_cache)"""
+    return LRUCache(maxsize=256, ttl=FEED_CACHE_TTL)
+
+
+def _load_feed(filter_query, limit):
+    """One page of summaries"""
+    documents, has_next, next_cursor = keyset_page(
+        current_app.db.posts, filter_query, FEED_SORT, limit, FEED_PROJECTION
+    )
+    
+    posts = []
+    for post in documents:
+        post['_id'] = str(post['_id'])
+        posts.append(PostSummary(**post).model_dump(exclude_none=True))
+    
+    return {
+        "posts": posts,
+        "pagination": {
+            "limit": limit,
+            "has_next": has_next,
+            "next_cursor": next_cursor
+        }
+    }
@@ -1,8 +1,10 @@
 from flask import Blueprint, request, jsonify, current_app
 from app.schemas.products import ProductCreate, ProductResponse
+from app.likes import delete_likes
 from pydantic import ValidationError
-from bson import ObjectId
+from bson import ObjectId, json_util
 from datetime import datetime, timezone
+from app.pagination import NEWEST_FIRST, decode_cursor, keyset_filter, keyset_page
 
 
 # Create blueprint for products
@@ -46,6 +48,10 @@ def create_product():
         product_dict['total_comments'] = 0
         product_dict['average_rating'] = None
         product_dict['total_ratings'] = 0
+        product_dict['rating_sum'] = 0
+        
+        # Derived fields for the text index and the case-insensitive brand filter
+        product_dict.update(product_search_fields(product_dict))
         
         # Insert into MongoDB
         result = current_app.db.products.insert_one(product_dict)
@@ -74,87 +80,163 @@ def list_products():
     """
     GET /api/products?category=rackets&gender=unisex&price_min=50&price_max=200
                       &brand=Wilson&page=1&limit=20
+    GET /api/products?category=rackets&cursor=&limit=20   (infinite scroll)
+    GET /api/products?q=wilson graphite racket&page=1      (search)
     
     Available filters:
     - category: rackets, shoes, shirts, etc.
     - gender: male, female, unisex
     - price_min / price_max: price range
-    - brand: Wilson, Nike, Adidas, etc.
+    - brand: Wilson, Nike, Adidas, etc. (case insensitive)
     - page: page number (default: 1)
     - limit: products per page (default: 20, max: 100)
+    
+    Keyset pagination:
+    - cursor: empty for the first page, then the next_cursor of the previous page.
+      Each page is a range query on (date, _id), constant time at any depth
+    - include_total: true to also return total_products
+    
+    Search:
+    - q: words searched with the text index over name, brand, color and specifications,
+      results ranked by relevance (can be combined with the filters)
+    
+    Responses are cached per normalized query string (app/product_cache.py)
+    until a product changes
     """
     try:
-        # Build MongoDB filter
-        filter_query = {"active": True}  # Only active products
-        
-        # Filter by category
-        category = request.args.get('category')
-        if category:
-            filter_query['category'] = category
-        
-        # Filter by gender
-        gender = request.args.get('gender')
-        if gender:
-            filter_query['gender'] = gender
-        
-        # Filter by brand
-        brand = request.args.get('brand')
-        if brand:
-            filter_query['brand'] = {'$regex': brand, '$options': 'i'}  # Case insensitive
-        
-        # Filter by price range
-        price_min = request.args.get('price_min', type=float)
-        price_max = request.args.get('price_max', type=float)
-        if price_min is not None or price_max is not None:
-            filter_query['price'] = {}
-            if price_min is not None:
-                filter_query['price']['$gte'] = price_min
-            if price_max is not None:
-                filter_query['price']['$lte'] = price_max
-        
-        # Pagination
-        page = request.args.get('page', 1, type=int)
-        limit = request.args.get('limit', 20, type=int)
-        limit = min(limit, 100)  # Maximum 100 products per page
-        skip = (page - 1) * limit
-        
-        # Sort by creation date (most recent first)
-        products_cursor = current_app.db.products.find(filter_query).sort(
-            'creation_date', -1
-        ).skip(skip).limit(limit)
-        
-        # Convert to list
-        products = []
-        for product in products_cursor:
-            product['_id'] = str(product['_id'])
-            # Add default fields if they don't exist
-            product.setdefault('comments', [])
-            product.setdefault('total_comments', 0)
-            product.setdefault('average_rating', None)
-            product.setdefault('total_ratings', 0)
-                
-            products.append(ProductResponse(**product).model_dump(exclude_none=True))
-        
-        # Count total products (for pagination)
-        total_products = current_app.db.products.count_documents(filter_query)
-        total_pages = (total_products + limit - 1) // limit
-        
-        return jsonify({
-            "products": products,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total_products": total_products,
-                "total_pages": total_pages,
-                "has_next": page < total_pages,
-                "has_prev": page > 1
-            }
-        }), 200
-        
+        cache = current_app.product_cache
+        body = cache.read(cache.lists, _query_key(), _load_products)
+        return jsonify(body), 200
+    
+    except ValueError as e:
+        # Invalid cursor
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def _load_products():
+    """Response body of list_products for the current request"""
+    # Build MongoDB filter
+    filter_query = {"active": True}  # Only active products
+    
+    # Filter by category
+    category = request.args.get('category')
+    if category:
+        filter_query['category'] = category
+    
+    # Filter by gender
+    gender = request.args.get('gender')
+    if gender:
+        filter_query['gender'] = gender
+    
+    # Filter by brand (normalized lowercase field → index equality instead of a regex)
+    brand = request.args.get('brand')
+    if brand:
+        filter_query['brand_lower'] = brand.strip().lower()
+    
+    # Filter by price range
+    price_min = request.args.get('price_min', type=float)
+    price_max = request.args.get('price_max', type=float)
+    if price_min is not None or price_max is not None:
+        filter_query['price'] = {}
+        if price_min is not None:
+            filter_query['price']['$gte'] = price_min
+        if price_max is not None:
+            filter_query['price']['$lte'] = price_max
+    
+    # Pagination
+    limit = request.args.get('limit', 20, type=int)
+    limit = max(1, min(limit, 100))  # 1 to 100 products per page
+    
+    page = request.args.get('page', 1, type=int)
+    
+    search = request.args.get('q', '').strip()
+    if search:
+        return _search_products(filter_query, search, page, limit)
+    
+    if 'cursor' in request.args:
+        return _list_products_keyset(filter_query, request.args.get('cursor'), limit)
+    
+    skip = (page - 1) * limit
+    
+    # Sort by creation date (most recent first)
+    products_cursor = current_app.db.products.find(filter_query).sort(
+        PRODUCT_SORT
+    ).skip(skip).limit(limit)
+    
+    # Convert to list
+    products = [_product_payload(product) for product in products_cursor]
+    
+    # Count total products (for pagination)
+    total_products = _count_products(filter_query)
+    total_pages = (total_products + limit - 1) // limit
+    
+    return {
+        "products": products,
+        "pagination": {
+            "page": page,
+            "limit": limit,
+            "total_products": total_products,
+            "total_pages": total_pages,
+            "has_next": page < total_pages,
+            "has_prev": page > 1
+        }
+    }
+
+
+def _search_products(filter_query, search, page, limit):
+    """Text index search, most relevant first"""
+    query = {**filter_query, "$text": {"$search": search}}
+    score = {"score": {"$meta": "textScore"}}
+    
+    products_cursor = current_app.db.products.find(query, score).sort(
+        [("score", {"$meta": "textScore"}), ("_id", -1)]
+    ).skip((page - 1) * limit).limit(limit)
+    
+    products = [_product_payload(product) for product in products_cursor]
+    total_products = _count_products(query)
+    total_pages = (total_products + limit - 1) // limit
+    
+    return {
+        "products": products,
+        "pagination": {
+            "page": page,
+            "limit": limit,
+            "total_products": total_products,
+            "total_pages": total_pages,
+            "has_next": page < total_pages,
+            "has_prev": page > 1
+        }
+    }
+
+
+def _list_products_keyset(filter_query, cursor, limit):
+    """Page after `cursor` (first page if empty)"""
+    if cursor:
+        values = decode_cursor(cursor, PRODUCT_SORT)  # ValueError → 400
+        query = {**filter_query, **keyset_filter(PRODUCT_SORT, values)}
+    else:
+        query = filter_query
+    
+    documents, has_next, next_cursor = keyset_page(
+        current_app.db.products, query, PRODUCT_SORT, limit
+    )
+    
+    pagination = {
+        "limit": limit,
+        "has_next": has_next,
+        "next_cursor": next_cursor
+    }
+    if request.args.get('include_total', 'false').lower() == 'true':
+        pagination["total_products"] = _count_products(filter_query)
+    
+    return {
+        "products": [_product_payload(product) for product in documents],
+        "pagination": pagination
+    }
+
+
 # ==================== VIEW PRODUCT DETAILS ====================
 
 @bp.route('/<product_id>', methods=['GET'])
@@ -162,31 +244,24 @@ def view_product(product_id):
     """
     GET /api/products/:product_id
     View complete details of a product
+    Served from the product cache, filled from MongoDB on a miss
     """
     try:
         # Validate ObjectId
         if not ObjectId.is_valid(product_id):
             return jsonify({"error": "Invalid product ID"}), 400
         
-        # Find product
-        product = current_app.db.products.find_one({"_id": ObjectId(product_id)})
+        def load():
+            product = current_app.db.products.find_one({"_id": ObjectId(product_id)})
+            return _product_payload(product) if product else None
+        
+        cache = current_app.product_cache
+        product = cache.read(cache.items, product_id, load)
         
         if not product:
             return jsonify({"error": "Product not found"}), 404
         
-        # Convert _id to string
-        product['_id'] = str(product['_id'])
-        
-        # Add default fields if they don't exist
-        product.setdefault('comments', [])
-        product.setdefault('total_comments', 0)
-        product.setdefault('average_rating', None)
-        product.setdefault('total_ratings', 0)
-        
-        # Validate with Pydantic
-        product_response = ProductResponse(**product)
-        
-        return jsonify(product_response.model_dump(exclude_none=True)), 200
+        return jsonify(product), 200
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -243,15 +318,71 @@ def delete_product(product_id):
             # Physical deletion: Delete permanently
             current_app.db.products.delete_one({"_id": ObjectId(product_id)})
             
-            # Also delete its comments
+            # Also delete its comments (and their likes)
+            comment_ids = [
+                str(comment['_id'])
+                for comment in current_app.db.comments.find(
+                    {"entity_type": "product", "entity_id": product_id}, {"_id": 1}
+                )
+            ]
             current_app.db.comments.delete_many({
                 "entity_type": "product",
                 "entity_id": product_id
             })
+            delete_likes(current_app.db, 'comment', comment_ids)
             
             message = "Product deleted permanently"
         
         return jsonify({"message": message}), 200
     
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+
+# ==================== HELPER FUNCTIONS ====================
+
+PRODUCT_SORT = NEWEST_FIRST
+
+def _product_payload(product):
+    """Product document → response dict"""
+    product['_id'] = str(product['_id'])
+    # Add default fields if they don't exist
+    product.setdefault('comments', [])
+    product.setdefault('total_comments', 0)
+    product.setdefault('average_rating', None)
+    product.setdefault('total_ratings', 0)
+    
+    return ProductResponse(**product).model_dump(exclude_none=True)
+
+
+def product_search_fields(product):
+    """
+    Derived fields stored with each product:
+    - brand_lower: brand normalized for the case-insensitive brand filter
+    - search_specs: specifications as "key value" strings (the text index only reads strings)
+    """
+    specs = []
+    for key, value in (product.get('specifications') or {}).items():
+        values = value if isinstance(value, list) else [value]
+        words = [str(key).replace('_', ' ')] + [str(v) for v in values if not isinstance(v, dict)]
+        specs.append(' '.join(words))
+    
+    return {
+        'brand_lower': (product.get('brand') or '').strip().lower(),
+        'search_specs': specs
+    }
+
+
+def _query_key():
+    """Query string normalized (sorted) so equivalent requests share a cache entry"""
+    return json_util.dumps(sorted(request.args.items(multi=True)))
+
+
+def _count_products(filter_query):
+    """count_documents cached per normalized filter until a product changes"""
+    cache = current_app.product_cache
+    return cache.read(
+        cache.counts,
+        json_util.dumps(filter_query, sort_keys=True),
+        lambda: current_app.db.products.count_documents(filter_query)
+    )
@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify, current_app
 from app.schemas.users import UserResponse, UserUpdate, CartItem
 from pydantic import ValidationError
 from bson import ObjectId
+from app.carts import get_cart, add_item, remove_item, empty_cart as empty_user_cart, cart_summary
 
 bp = Blueprint('users', __name__, url_prefix='/api/users')
 
@@ -32,13 +33,15 @@ def get_profile(user_id):
         if not ObjectId.is_valid(user_id):
             return jsonify({"error": "Invalid user ID"}), 400
         
-        user = current_app.db.users.find_one({"_id": ObjectId(user_id)})
+        user = current_app.db.users.find_one(
+            {"_id": ObjectId(user_id)},
+            {"password": 0, "cart": 0}  # the cart lives in the carts collection
+        )
         
         if not user:
             return jsonify({"error": "User not found"}), 404
         
         user['_id'] = str(user['_id'])
-        user.pop('password', None)
         
         user_response = UserResponse(**user)
         
@@ -75,9 +78,8 @@ def update_profile(user_id):
         if result.matched_count == 0:
             return jsonify({"error": "User not found"}), 404
         
-        user = current_app.db.users.find_one({"_id": ObjectId(user_id)})
+        user = current_app.db.users.find_one({"_id": ObjectId(user_id)}, {"password": 0, "cart": 0})
         user['_id'] = str(user['_id'])
-        user.pop('password', None)
         
         user_response = UserResponse(**user)
         
@@ -104,23 +106,12 @@ def view_cart(user_id):
         if not ObjectId.is_valid(user_id):
             return jsonify({"error": "Invalid user ID"}), 400
         
-        user = current_app.db.users.find_one(
-            {"_id": ObjectId(user_id)},
-            {"cart": 1}  
-        )
+        items = get_cart(current_app.db, user_id)
         
-        if not user:
+        if items is None:
             return jsonify({"error": "User not found"}), 404
         
-        cart = user.get('cart', [])
-        
-        total = sum(item['price'] * item['quantity'] for item in cart)
-        
-        return jsonify({
-            "cart": cart,
-            "total_items": len(cart),
-            "total_price": round(total, 2)
-        }), 200
+        return jsonify(cart_summary(items)), 200
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -138,6 +129,7 @@ def add_to_cart(user_id):
         "size": "M" (optional)
     }
     Add a product to the cart
+    One atomic update: $inc of the quantity if it is already in the cart, $push otherwise
     """
     try:
         if not ObjectId.is_valid(user_id):
@@ -145,40 +137,15 @@ def add_to_cart(user_id):
         
         item_data = CartItem(**request.json)
         
-        user = current_app.db.users.find_one({"_id": ObjectId(user_id)})
+        result = add_item(current_app.db, user_id, item_data.model_dump(exclude_none=True))
         
-        if not user:
+        if result is None:
             return jsonify({"error": "User not found"}), 404
         
-        cart = user.get('cart', [])
-        existing_product_index = None
-
-        for i, item in enumerate(cart):
-            if (item['product_id'] == item_data.product_id and 
-                item.get('size') == item_data.size):
-                existing_product_index = i
-                break
+        cart, added = result
+        message = "Product added to the cart" if added else "Quantity updated in the cart"
         
-        if existing_product_index is not None:
-            cart[existing_product_index]['quantity'] += item_data.quantity
-            message = "Quantity updated in the cart"
-        else:
-            cart.append(item_data.model_dump(exclude_none=True))
-            message = "Product added to the cart"
-        
-        current_app.db.users.update_one(
-            {"_id": ObjectId(user_id)},
-            {"$set": {"cart": cart}}
-        )
-        
-        total = sum(item['price'] * item['quantity'] for item in cart)
-        
-        return jsonify({
-            "message": message,
-            "cart": cart,
-            "total_items": len(cart),
-            "total_price": round(total, 2) 
-        }), 200
+        return jsonify({"message": message, **cart_summary(cart)}), 200
     
     except ValidationError as e:
         return jsonify({"error": "Invalid data", "details": e.errors()}), 400
@@ -190,7 +157,7 @@ def add_to_cart(user_id):
 def remove_from_cart(user_id, product_id):
     """
     DELETE /api/users/:user_id/cart/:product_id?size=M
-    Remove a product from the cart
+    Remove a product from the cart (atomic $pull)
     """
     try:
         if not ObjectId.is_valid(user_id):
@@ -198,35 +165,14 @@ def remove_from_cart(user_id, product_id):
         
         size = request.args.get('size')
         
-        user = current_app.db.users.find_one({"_id": ObjectId(user_id)})
-        
-        if not user:
-            return jsonify({"error": "User not found"}), 404
-        
-        cart = user.get('cart', [])
+        cart = remove_item(current_app.db, user_id, product_id, size)
         
-        new_cart = [
-            item for item in cart 
-            if not (item['product_id'] == product_id and 
-                   item.get('size') == size) 
-        ]
-        
-        if len(cart) == len(new_cart):
+        if cart is None:
+            if not current_app.db.users.count_documents({"_id": ObjectId(user_id)}, limit=1):
+                return jsonify({"error": "User not found"}), 404
             return jsonify({"error": "Product not found in the cart"}), 404
         
-        current_app.db.users.update_one(
-            {"_id": ObjectId(user_id)},
-            {"$set": {"cart": new_cart}}
-        )
-        
-        total = sum(item['price'] * item['quantity'] for item in new_cart)
-        
-        return jsonify({
-            "message": "Product removed from cart",
-            "cart": new_cart,
-            "total_items": len(new_cart),
-            "total_price": round(total, 2) 
-        }), 200
+        return jsonify({"message": "Product removed from cart", **cart_summary(cart)}), 200
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -242,14 +188,11 @@ def empty_cart(user_id):
         if not ObjectId.is_valid(user_id):
             return jsonify({"error": "Invalid user ID"}), 400
         
-        result = current_app.db.users.update_one(
-            {"_id": ObjectId(user_id)},
-            {"$set": {"cart": []}}
-        )
-        
-        if result.matched_count == 0:
+        if not current_app.db.users.count_documents({"_id": ObjectId(user_id)}, limit=1):
             return jsonify({"error": "User not found"}), 404
         
+        empty_user_cart(current_app.db, user_id)
+        
         return jsonify({
             "message": "Cart emptied successfully",
             "cart": [],
@@ -73,6 +73,30 @@ class PostResponse(BaseModel):
     class Config:
         populate_by_name = True
 
+# FEED Schema: list item without content/comments
+class PostSummary(BaseModel):
+    id: str = Field(..., alias="_id")
+    type: PostType
+    category: PostCategory
+    title: str
+    author_id: str
+    author_name: str
+    date: datetime
+    summary: Optional[str] = None
+    images: Optional[List[Image]] = None
+    
+    # Metrics
+    views: int = 0
+    likes: int = 0
+    total_comments: int = 0
+    
+    # Moderation
+    status: Optional[str] = None
+    visible: Optional[bool] = None
+    
+    class Config:
+        populate_by_name = True
+
 # Schema to UPDATE discussion
 class PostUpdate(BaseModel):
     title: Optional[str] = Field(None, min_length=10, max_length=200)
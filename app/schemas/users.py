@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field, field_validator
-from typing import Optional, List
+from typing import Optional
 from datetime import datetime
 from enum import Enum
 
@@ -55,7 +55,6 @@ class UserResponse(BaseModel):  # Validates responses just in case
     location: Optional[Location] = None
     date: datetime
     statistics: Optional[Statistics] = None
-    cart: Optional[List[CartItem]] = None
     
     class Config:
         populate_by_name = True  # Allows using both _id and id
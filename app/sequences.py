@@ -0,0 +1,64 @@
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+import os
+import threading
+
+'''
+--SEQUENCES--
+
+Counter documents in the counters collection: {"_id": "<name>", "seq": <last value handed out>}
+A value is reserved with one atomic find_one_and_update + $inc (upsert), so it is O(1)
+and unique across threads and processes.
+
+With block > 1 each process reserves `block` values per round trip and hands them
+out locally (values stay unique but are no longer consecutive across processes,
+and the unused part of a block is lost when the process stops).
+'''
+
+BLOCK_SIZE = int(os.getenv('SEQUENCE_BLOCK_SIZE', '1'))
+
+_lock = threading.Lock()
+_ranges = {}  # name -> [next value, last reserved value]
+_seeded = set()
+
+
+def _seed(db, name, initial):
+    """Create the counter with a starting value if it does not exist yet"""
+    if name in _seeded:
+        return
+    if db.counters.find_one({'_id': name}, {'_id': 1}) is None:
+        try:
+            db.counters.update_one(
+                {'_id': name},
+                {'$setOnInsert': {'seq': initial()}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            pass  # another process created it first
+    _seeded.add(name)
+
+
+def next_value(db, name, block=BLOCK_SIZE, initial=None):
+    """
+    Next value of the sequence `name`.
+    initial: optional callable returning the last value already used, called once
+    when the counter does not exist (e.g. to continue numbering of existing data)
+    """
+    with _lock:
+        current, last = _ranges.get(name, (1, 0))
+
+        if current > last:
+            if initial is not None:
+                _seed(db, name, initial)
+
+            counter = db.counters.find_one_and_update(
+                {'_id': name},
+                {'$inc': {'seq': block}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            last = counter['seq']
+            current = last - block + 1
+
+        _ranges[name] = (current + 1, last)
+        return current
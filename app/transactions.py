@@ -0,0 +1,88 @@
+from pymongo.errors import PyMongoError
+import os
+import random
+import threading
+import time
+
+'''
+--TRANSACTIONS--
+
+run_transaction(client, callback) runs callback(session) inside a transaction
+with the retry rules of the MongoDB drivers (like ClientSession.with_transaction),
+but with a bounded number of attempts and exponential backoff with jitter:
+
+- TransientTransactionError (write conflict, primary stepdown...) → retry the whole transaction
+- UnknownTransactionCommitResult → retry only the commit
+- any other error → abort and raise
+'''
+
+MAX_ATTEMPTS = int(os.getenv('TRANSACTION_MAX_ATTEMPTS', '5'))
+BASE_DELAY = float(os.getenv('TRANSACTION_BASE_DELAY', '0.01'))  # seconds
+MAX_DELAY = float(os.getenv('TRANSACTION_MAX_DELAY', '0.5'))  # seconds
+
+_stats = {
+    'commits': 0,
+    'retries': 0,  # whole transaction retried
+    'commit_retries': 0,
+    'aborts': 0,  # driver/transaction failures (after the retries)
+    'callback_errors': 0  # business errors raised by the callback (e.g. StockError)
+}
+_stats_lock = threading.Lock()
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def transaction_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _backoff(attempt, base_delay, max_delay):
+    """Exponential backoff with full jitter"""
+    time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1))))
+
+
+def _has_label(error, label):
+    return isinstance(error, PyMongoError) and error.has_error_label(label)
+
+
+def run_transaction(client, callback, max_attempts=MAX_ATTEMPTS,
+                    base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+    """Run callback(session) in a transaction and return its result"""
+    with client.start_session() as session:
+        for attempt in range(1, max_attempts + 1):
+            session.start_transaction()
+            try:
+                result = callback(session)
+            except Exception as e:
+                if session.in_transaction:
+                    session.abort_transaction()
+                if _has_label(e, 'TransientTransactionError') and attempt < max_attempts:
+                    _count('retries')
+                    _backoff(attempt, base_delay, max_delay)
+                    continue
+                # Only driver errors count as aborts, so the counter measures contention
+                _count('aborts' if isinstance(e, PyMongoError) else 'callback_errors')
+                raise
+
+            commit_attempt = 1
+            while True:
+                try:
+                    session.commit_transaction()
+                    _count('commits')
+                    return result
+                except Exception as e:
+                    if _has_label(e, 'UnknownTransactionCommitResult') and commit_attempt < max_attempts:
+                        _count('commit_retries')
+                        _backoff(commit_attempt, base_delay, max_delay)
+                        commit_attempt += 1
+                        continue
+                    if _has_label(e, 'TransientTransactionError') and attempt < max_attempts:
+                        _count('retries')
+                        _backoff(attempt, base_delay, max_delay)
+                        break  # retry the whole transaction
+                    _count('aborts')
+                    raise
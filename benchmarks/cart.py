@@ -0,0 +1,45 @@
+import argparse
+import requests
+from benchmarks.common import url, create_user, run_concurrent, report
+
+'''
+python -m benchmarks.cart --adds 200 --products 3 --concurrency 32
+
+Parallel "add to cart" requests of a few products on the same user (several tabs
+adding at once). Each add is quantity 1, so at the end every product line must
+have exactly the number of adds sent for it: any difference is a lost write.
+'''
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent add to cart benchmark')
+    parser.add_argument('--adds', type=int, default=200, help='add requests in total')
+    parser.add_argument('--products', type=int, default=3, help='distinct products added')
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args()
+
+    user = create_user()
+    cart_url = url(f"/api/users/{user['id']}/cart")
+
+    product_ids = [f"{i:024x}" for i in range(1, args.products + 1)]
+    jobs = [product_ids[i % len(product_ids)] for i in range(args.adds)]
+    expected = {product_id: jobs.count(product_id) for product_id in product_ids}
+
+    def add(product_id):
+        body = {"product_id": product_id, "name": "Benchmark product", "price": 10.0, "quantity": 1}
+        return requests.post(cart_url, json=body).status_code
+
+    statuses, latencies, elapsed = run_concurrent(add, jobs, args.concurrency)
+    report("POST /api/users/<id>/cart", latencies, elapsed)
+
+    errors = sum(1 for status in statuses if status != 200)
+    cart = requests.get(cart_url).json()['cart']
+    quantities = {item['product_id']: item['quantity'] for item in cart}
+
+    print(f"errors: {errors}")
+    print(f"cart lines: {len(cart)} (expected {len(product_ids)})")
+    lost = sum(expected[p] - quantities.get(p, 0) for p in product_ids)
+    print(f"lost adds: {lost} -> {'OK' if lost == 0 and len(cart) == len(product_ids) else 'WRONG'}")
+
+
+if __name__ == '__main__':
+    main()
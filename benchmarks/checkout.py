@@ -0,0 +1,71 @@
+import argparse
+import uuid
+import requests
+from benchmarks.common import url, create_user, run_concurrent, report
+
+'''
+python -m benchmarks.checkout --stock 100 --orders 300 --concurrency 32
+
+Many checkouts of the same SKU in parallel. Exactly `stock` orders must succeed,
+the rest must fail with 400 (no stock) and never with 500, and the final stock
+must be 0. Prints the transaction retry/abort counters of the API (/stats).
+'''
+
+def create_product(stock):
+    body = {
+        "name": f"Benchmark Racket {uuid.uuid4().hex[:6]}",
+        "price": 100.0,
+        "brand": "Benchmark",
+        "category": "rackets",
+        "stock": stock
+    }
+    response = requests.post(url('/api/products'), json=body)
+    response.raise_for_status()
+    return response.json()['product']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Checkout contention benchmark (one hot SKU)')
+    parser.add_argument('--stock', type=int, default=100)
+    parser.add_argument('--orders', type=int, default=300)
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args()
+
+    user = create_user()
+    product = create_product(args.stock)
+    before = requests.get(url('/stats')).json()['transactions']
+
+    order = {
+        "user_id": user['id'],
+        "items": [{
+            "product_id": product['id'],
+            "name": product['name'],
+            "price": product['price'],
+            "quantity": 1
+        }],
+        "total": product['price'],
+        "shipping_address": {"street": "Main Street 123", "city": "Madrid", "postal_code": "28001"},
+        "payment_method": "card"
+    }
+
+    def checkout(_):
+        return requests.post(url('/api/orders'), json=order).status_code
+
+    statuses, latencies, elapsed = run_concurrent(checkout, range(args.orders), args.concurrency)
+    report("POST /api/orders (same SKU)", latencies, elapsed)
+
+    after = requests.get(url('/stats')).json()['transactions']
+    created = statuses.count(201)
+    stock = requests.get(url(f"/api/products/{product['id']}")).json()['stock']
+    expected = min(args.orders, args.stock)
+
+    print(f"created: {created} (expected {expected}) | no stock (400): {statuses.count(400)} "
+          f"| errors (500): {statuses.count(500)}")
+    print(f"final stock: {stock} (expected {args.stock - expected})")
+    print("transactions: " + ", ".join(f"{k}={after[k] - before.get(k, 0)}" for k in after))
+    ok = created == expected and stock == args.stock - expected and statuses.count(500) == 0
+    print('OK' if ok else 'WRONG')
+
+
+if __name__ == '__main__':
+    main()
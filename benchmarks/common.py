@@ -0,0 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import statistics
+import time
+import uuid
+import requests
+
+'''
+Helpers shared by the benchmark scripts.
+They run against a live API (docker compose up) like app/consumers/simulation.py
+'''
+
+API_URL = os.getenv('API_URL', 'http://localhost:5000')
+
+
+def url(path):
+    return f"{API_URL}{path}"
+
+
+def create_user(session=None, password='12345678'):
+    """Register a throwaway user and return its JSON"""
+    http = session or requests
+    user = {
+        "name": "Benchmark User",
+        "email": f"bench-{uuid.uuid4().hex[:12]}@email.com",
+        "password": password,
+        "level": "intermediate"
+    }
+    response = http.post(url('/api/auth/register'), json=user)
+    response.raise_for_status()
+    created = response.json()['user']
+    created['password'] = password
+    return created
+
+
+def create_post(user):
+    body = {
+        "author_id": user['id'],
+        "author_name": user['name'],
+        "type": "discussion",
+        "category": "general",
+        "title": "Benchmark post",
+        "content": "Post created by the benchmark scripts"
+    }
+    response = requests.post(url('/api/posts'), json=body)
+    response.raise_for_status()
+    return response.json()['post']
+
+
+def run_concurrent(task, jobs, concurrency):
+    """
+    Run task(job) for every job with `concurrency` threads.
+    Returns (results, latencies_ms, elapsed_s)
+    """
+    def timed(job):
+        start = time.perf_counter()
+        result = task(job)
+        return result, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(timed, jobs))
+    elapsed = time.perf_counter() - start
+
+    return [r for r, _ in outcomes], [l for _, l in outcomes], elapsed
+
+
+def report(name, latencies, elapsed):
+    latencies = sorted(latencies)
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"{name}: {len(latencies)} requests in {elapsed:.2f}s "
+          f"({len(latencies) / elapsed:.0f} req/s) "
+          f"p50={statistics.median(latencies):.1f}ms p95={p95:.1f}ms max={latencies[-1]:.1f}ms")
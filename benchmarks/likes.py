@@ -0,0 +1,96 @@
+import argparse
+import random
+import requests
+from benchmarks.common import url, create_user, create_post, run_concurrent, report
+
+'''
+python -m benchmarks.likes --users 50 --toggles 10 --concurrency 32
+python -m benchmarks.likes --compare    # inside the api container (needs MONGO_URI)
+
+Many users toggle the like of the same post in parallel. Each user toggles a
+known number of times, so the final counter must equal the users with an odd
+number of toggles. Reports latency and whether the count is correct.
+
+--compare runs the same toggles directly against MongoDB with the old
+read-then-write toggle (find_one + $addToSet/$pull on liked_by_users) and with
+app.likes.toggle_like, on two scratch posts, and reports both latencies and counts.
+'''
+
+def legacy_toggle(db, post_id, user_id):
+    """The old toggle: read the whole post, then $addToSet/$pull + $inc"""
+    post = db.posts.find_one({"_id": post_id})
+    if user_id in post.get('liked_by_users', []):
+        db.posts.update_one({"_id": post_id}, {"$pull": {"liked_by_users": user_id}, "$inc": {"likes": -1}})
+    else:
+        db.posts.update_one({"_id": post_id}, {"$addToSet": {"liked_by_users": user_id}, "$inc": {"likes": 1}})
+
+
+def compare(jobs, expected, concurrency):
+    from app.extensions import init_db
+    from app.likes import toggle_like
+
+    db, _ = init_db()
+    legacy_id = db.posts.insert_one({"title": "Benchmark legacy likes", "likes": 0, "liked_by_users": []}).inserted_id
+    post_id = db.posts.insert_one({"title": "Benchmark likes", "likes": 0}).inserted_id
+
+    try:
+        _, latencies, elapsed = run_concurrent(
+            lambda user_id: legacy_toggle(db, legacy_id, user_id), jobs, concurrency
+        )
+        report("read-then-write toggle", latencies, elapsed)
+        legacy = db.posts.find_one({"_id": legacy_id})
+        print(f"  likes: {legacy['likes']}, liked_by_users: {len(legacy['liked_by_users'])} (expected {expected})")
+
+        _, latencies, elapsed = run_concurrent(
+            lambda user_id: toggle_like(db, 'post', str(post_id), user_id), jobs, concurrency
+        )
+        report("likes collection toggle", latencies, elapsed)
+        likes = db.posts.find_one({"_id": post_id})['likes']
+        documents = db.likes.count_documents({"entity_type": "post", "entity_id": str(post_id)})
+        print(f"  likes: {likes}, like documents: {documents} (expected {expected})")
+    finally:
+        db.posts.delete_many({"_id": {"$in": [legacy_id, post_id]}})
+        db.likes.delete_many({"entity_type": "post", "entity_id": str(post_id)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent like toggle benchmark')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--toggles', type=int, default=10, help='max toggles per user')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--compare', action='store_true',
+                        help='old read-then-write toggle vs the likes collection, directly on MongoDB')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+
+    # Each user id toggles a random number of times, shuffled across all threads
+    toggles = {f"bench-user-{i}": random.randint(1, args.toggles) for i in range(args.users)}
+    jobs = [user_id for user_id, n in toggles.items() for _ in range(n)]
+    random.shuffle(jobs)
+    expected = sum(1 for n in toggles.values() if n % 2 == 1)
+
+    if args.compare:
+        compare(jobs, expected, args.concurrency)
+        return
+
+    author = create_user()
+    post = create_post(author)
+    like_url = url(f"/api/posts/{post['id']}/like")
+
+    def toggle(user_id):
+        response = requests.post(like_url, json={"user_id": user_id})
+        return response.status_code
+
+    statuses, latencies, elapsed = run_concurrent(toggle, jobs, args.concurrency)
+    report("POST /api/posts/<id>/like", latencies, elapsed)
+
+    errors = sum(1 for status in statuses if status != 200)
+    likes = requests.get(url(f"/api/posts/{post['id']}")).json()['likes']
+    print(f"errors: {errors}")
+    print(f"final likes: {likes} (expected {expected}) -> {'OK' if likes == expected else 'WRONG'}")
+
+
+if __name__ == '__main__':
+    main()
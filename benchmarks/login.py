@@ -0,0 +1,38 @@
+import argparse
+import requests
+from benchmarks.common import url, create_user, run_concurrent, report
+
+'''
+python -m benchmarks.login --logins 200 --concurrency 1 4 16 64
+
+Logs the same user in repeatedly at several concurrency levels and reports the
+throughput of POST /api/auth/login. Requests rejected because the hashing queue
+is full (503) are counted apart. The /stats hashing counters are printed at the end.
+'''
+
+def main():
+    parser = argparse.ArgumentParser(description='Login throughput benchmark')
+    parser.add_argument('--logins', type=int, default=200, help='logins per concurrency level')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    user = create_user()
+    login_url = url('/api/auth/login')
+    credentials = {"email": user['email'], "password": user['password']}
+
+    def login(_):
+        return requests.post(login_url, json=credentials).status_code
+
+    for concurrency in args.concurrency:
+        statuses, latencies, elapsed = run_concurrent(login, range(args.logins), concurrency)
+        ok = sum(1 for status in statuses if status == 200)
+        rejected = sum(1 for status in statuses if status == 503)
+        report(f"login x{concurrency}", latencies, elapsed)
+        print(f"  ok: {ok} ({ok / elapsed:.1f} logins/s), 503: {rejected}, "
+              f"other errors: {len(statuses) - ok - rejected}")
+
+    print(f"hashing: {requests.get(url('/stats')).json().get('hashing')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,379 @@
+from bson import ObjectId, json_util
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from faker import Faker
+import argparse
+import bcrypt
+import glob
+import os
+import random
+import time
+from app.routes.products import product_search_fields
+from app.hashing import BCRYPT_ROUNDS
+
+'''
+--SYNTHETIC DATA--
+
+python -m generate_data --users 1000000 --products 50000 --posts 200000 --comments 5000000 --orders 1000000
+python -m insert_data
+python -m maintenance comments && python -m maintenance ratings
+
+Writes realistic users, products, posts, comments and orders shaped like the
+app/schemas models as JSONL shards: data/<collection>/part-00000.jsonl ...
+Shards are generated in parallel processes.
+
+Deterministic: every document is generated from its own seed (--seed + collection + index)
+and its _id is derived from the collection and the index, so the same arguments always
+produce the same data (whatever --shard-size or --workers) and references between
+collections (author, entity, parent comment, product of an order) need no lookups.
+Only the password hash (one bcrypt hash shared by every user, PASSWORD) changes between runs.
+
+Posts and products are written with empty comment counters, recent comments cache
+and ratings; rebuild them from the generated comments after loading:
+
+python -m maintenance comments   # total_comments + recent comments cache
+python -m maintenance ratings    # rating_sum / total_ratings / average_rating
+'''
+
+COLLECTIONS = ['users', 'products', 'posts', 'comments', 'orders']
+DATA_DIR = 'data'
+SHARD_SIZE = 100_000
+WORKERS = os.cpu_count() or 1
+SEED = 42
+PASSWORD = '12345678'
+
+# First byte of the generated ObjectIds
+COLLECTION_CODES = {name: code for code, name in enumerate(COLLECTIONS, start=1)}
+
+START_DATE = datetime(2023, 1, 1, tzinfo=timezone.utc)
+END_DATE = datetime(2025, 12, 31, tzinfo=timezone.utc)
+
+BRANDS = ['Wilson', 'Babolat', 'Head', 'Yonex', 'Prince', 'Tecnifibre', 'Dunlop', 'Nike', 'Adidas', 'Asics']
+COLORS = ['black', 'white', 'red', 'blue', 'green', 'yellow', 'orange', 'grey']
+SHOE_SIZES = [str(size) for size in range(36, 47)]
+SHIRT_SIZES = ['XS', 'S', 'M', 'L', 'XL', 'XXL']
+POST_CATEGORIES = ['equipment', 'technique', 'training', 'matches', 'clubs',
+                   'general', 'tips', 'nutrition', 'news', 'tournaments']
+
+
+def object_id(collection_name, index):
+    """Deterministic ObjectId of the index-th document of a collection"""
+    return ObjectId(f"{COLLECTION_CODES[collection_name]:02x}{index:022x}")
+
+
+_fake = None
+
+
+def _random(seed, collection_name, index, stream=''):
+    """Random generator seeded for one document (stream: independent sequence of the same document)"""
+    return random.Random(f"{seed}:{collection_name}:{index}:{stream}")
+
+
+def _faker(seed, collection_name, index):
+    """Faker of the process reseeded for one document (creating a Faker per document is slow)"""
+    global _fake
+    if _fake is None:
+        _fake = Faker()
+    _fake.seed_instance(f"{seed}:{collection_name}:{index}")
+    return _fake
+
+
+def _date(rng, start=START_DATE, end=END_DATE):
+    return start + timedelta(seconds=rng.randint(0, max(0, int((end - start).total_seconds()))))
+
+
+def _location(fake):
+    return {
+        'street': fake.street_address(),
+        'city': fake.city(),
+        'postal_code': fake.postcode(),
+        'phone': fake.phone_number()
+    }
+
+
+# ==================== DOCUMENTS ====================
+# References are resolved before seeding the Faker of the document itself
+
+def _role(index):
+    # Like the sample data: 1 admin, 2 companies, the rest users
+    return 'admin' if index == 0 else 'company' if index < 3 else 'user'
+
+
+def user_name(seed, index):
+    fake = _faker(seed, 'users', index)
+    return fake.company() if _role(index) == 'company' else fake.name()
+
+
+def make_user(index, spec):
+    rng = _random(spec['seed'], 'users', index)
+    fake = _faker(spec['seed'], 'users', index)
+    name = fake.company() if _role(index) == 'company' else fake.name()  # = user_name()
+    return {
+        '_id': object_id('users', index),
+        'name': name,
+        'email': f"{fake.user_name()}{index}@{fake.free_email_domain()}",
+        'role': _role(index),
+        'password': spec['password_hash'],
+        'level': rng.choice(['beginner', 'intermediate', 'advanced']),
+        'location': _location(fake),
+        'date': _date(rng),
+        'statistics': {'published_articles': 0, 'forum_posts': rng.randint(0, 50)}
+    }
+
+
+def make_product(index, spec):
+    rng = _random(spec['seed'], 'products', index)
+    fake = _faker(spec['seed'], 'products', index)
+    category = rng.choice(['rackets', 'shoes', 'shirts', 'balls', 'racket_bags', 'caps', 'wristbands'])
+    brand = rng.choice(BRANDS)
+    product = {
+        '_id': object_id('products', index),
+        'name': f"{brand} {fake.word().capitalize()} {category.replace('_', ' ').rstrip('s')} {rng.randint(1, 999)}",
+        'price': round(rng.uniform(5, 300), 2),
+        'brand': brand,
+        'category': category,
+        'gender': rng.choice(['male', 'female', 'unisex']),
+        'color': rng.choice(COLORS),
+        'images': [f"https://picsum.photos/seed/product{index}-{i}/600" for i in range(rng.randint(1, 3))],
+        'active': rng.random() < 0.95,
+    }
+
+    # Stock by size (shoes, shirts) or simple stock
+    if category in ('shoes', 'shirts'):
+        sizes = SHOE_SIZES if category == 'shoes' else SHIRT_SIZES
+        product['sizes'] = sizes
+        product['stocks'] = [{'size': size, 'stock': rng.randint(0, 40)} for size in sizes]
+    else:
+        product['stock'] = rng.randint(0, 200)
+
+    if category == 'rackets':
+        product['specifications'] = {
+            'weight': f"{rng.randint(255, 320)}g",
+            'head_size': f"{rng.randint(95, 110)} sq in",
+            'balance': f"{rng.randint(310, 340)}mm",
+            'string_pattern': rng.choice(['16x19', '18x20', '16x18'])
+        }
+    elif category == 'shoes':
+        product['specifications'] = {'surface': rng.choice(['clay', 'hard', 'grass', 'all court'])}
+    elif category == 'balls':
+        product['specifications'] = {'units': rng.choice([3, 4]), 'pressure': rng.choice(['pressurized', 'pressureless'])}
+
+    product.update({
+        'date': _date(rng),
+        'total_comments': 0,
+        'average_rating': None,
+        'total_ratings': 0,
+        'rating_sum': 0,
+        'comments': [],
+        **product_search_fields(product)
+    })
+    return product
+
+
+def make_post(index, spec):
+    rng = _random(spec['seed'], 'posts', index)
+    author_index = rng.randrange(spec['users'])
+    author_name = user_name(spec['seed'], author_index)
+    fake = _faker(spec['seed'], 'posts', index)
+    return {
+        '_id': object_id('posts', index),
+        'author_id': str(object_id('users', author_index)),
+        'author_name': author_name,
+        'type': rng.choice(['discussion', 'discussion', 'article']),
+        'category': rng.choice(POST_CATEGORIES),
+        'title': fake.sentence(nb_words=rng.randint(4, 10))[:100],
+        'content': '\n\n'.join(fake.paragraphs(nb=rng.randint(1, 5))),
+        'summary': fake.sentence(nb_words=20)[:500],
+        'date': _date(rng),
+        'views': rng.randint(0, 5000),
+        'likes': 0,
+        'comments': [],
+        'total_comments': 0,
+        'status': 'approved',
+        'visible': True,
+        'moderation_date': END_DATE
+    }
+
+
+def _comment_parent(seed, index):
+    """Index of the parent comment (~30% are replies to an earlier comment) or None"""
+    rng = _random(seed, 'comments', index, 'parent')
+    if index > 0 and rng.random() < 0.3:
+        return rng.randrange(index)
+    return None
+
+
+def _comment_entity(seed, index, spec):
+    """(entity_type, entity_id) of a main comment: 60% products, 40% posts"""
+    rng = _random(seed, 'comments', index, 'entity')
+    if spec['products'] and (not spec['posts'] or rng.random() < 0.6):
+        return 'product', str(object_id('products', rng.randrange(spec['products'])))
+    return 'post', str(object_id('posts', rng.randrange(spec['posts'])))
+
+
+def _comment_date(seed, index):
+    """Date of a comment, replies always after their parent"""
+    parent = _comment_parent(seed, index)
+    start = START_DATE if parent is None else _comment_date(seed, parent)
+    return _date(_random(seed, 'comments', index, 'date'), start=start)
+
+
+def make_comment(index, spec):
+    seed = spec['seed']
+    rng = _random(seed, 'comments', index)
+    user_index = rng.randrange(spec['users'])
+    name = user_name(seed, user_index)
+
+    # A reply belongs to the entity of the main comment of its thread
+    parent = _comment_parent(seed, index)
+    root = index
+    while (root_parent := _comment_parent(seed, root)) is not None:
+        root = root_parent
+    entity_type, entity_id = _comment_entity(seed, root, spec)
+
+    fake = _faker(seed, 'comments', index)
+    comment = {
+        '_id': object_id('comments', index),
+        'entity_type': entity_type,
+        'entity_id': entity_id,
+        'user_id': str(object_id('users', user_index)),
+        'user_name': name,
+        'text': fake.sentence(nb_words=rng.randint(3, 40))[:1000],
+        'date': _comment_date(seed, index),
+        'likes': 0
+    }
+    if parent is not None:
+        comment['reply_to'] = str(object_id('comments', parent))
+    elif entity_type == 'product' and rng.random() < 0.7:
+        comment['rating'] = rng.choices([1, 2, 3, 4, 5], weights=[5, 8, 17, 35, 35])[0]
+    return comment
+
+
+def make_order(index, spec):
+    rng = _random(spec['seed'], 'orders', index)
+    order_date = _date(rng)
+
+    items = []
+    for product_index in rng.sample(range(spec['products']), min(rng.randint(1, 4), spec['products'])):
+        product = make_product(product_index, spec)  # same generator: real name, price and sizes
+        item = {
+            'product_id': str(product['_id']),
+            'name': product['name'],
+            'price': product['price'],
+            'quantity': rng.randint(1, 3),
+            'image': product['images'][0]
+        }
+        if product.get('sizes'):
+            item['size'] = rng.choice(product['sizes'])
+        items.append(item)
+
+    fake = _faker(spec['seed'], 'orders', index)
+    return {
+        '_id': object_id('orders', index),
+        # Unique across the dataset (the index), 6 digits like _generate_order_number
+        'order_number': f"ORD-{order_date.year}-{index + 1:06d}",
+        'user_id': str(object_id('users', rng.randrange(spec['users']))),
+        'order_date': order_date,
+        'items': items,
+        'total': round(sum(item['price'] * item['quantity'] for item in items), 2),
+        'shipping_address': _location(fake),
+        'payment_method': rng.choice(['card', 'paypal', 'transfer'])
+    }
+
+
+GENERATORS = {
+    'users': make_user,
+    'products': make_product,
+    'posts': make_post,
+    'comments': make_comment,
+    'orders': make_order,
+}
+
+# Collections that must exist for the references of each one
+REQUIRES = {
+    'posts': ['users'],
+    'comments': ['users', 'products|posts'],
+    'orders': ['users', 'products'],
+}
+
+
+# ==================== SHARDS ====================
+
+def write_shard(collection_name, shard, start, end, spec, data_dir):
+    """Generate documents [start, end) into one JSONL shard. Returns (collection, documents, seconds)"""
+    began = time.perf_counter()
+    generator = GENERATORS[collection_name]
+    path = os.path.join(data_dir, collection_name, f"part-{shard:05d}.jsonl")
+    tmp = f"{path}.tmp"
+
+    with open(tmp, 'w', encoding='utf-8') as f:
+        for index in range(start, end):
+            f.write(json_util.dumps(generator(index, spec)))
+            f.write('\n')
+    os.replace(tmp, path)  # insert_data never sees a half written shard
+
+    return collection_name, end - start, time.perf_counter() - began
+
+
+def generate(counts, seed=SEED, data_dir=DATA_DIR, shard_size=SHARD_SIZE, workers=WORKERS):
+    for collection_name, required in REQUIRES.items():
+        missing = [
+            names for names in required
+            if not any(counts.get(name) for name in names.split('|'))
+        ]
+        if counts.get(collection_name) and missing:
+            raise ValueError(f"{collection_name} need documents of: {', '.join(missing)}")
+
+    spec = {
+        'seed': seed,
+        'password_hash': bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(BCRYPT_ROUNDS)).decode('utf-8'),
+        **{name: counts.get(name, 0) for name in COLLECTIONS}
+    }
+
+    jobs = []
+    for collection_name in COLLECTIONS:
+        total = counts.get(collection_name, 0)
+        if not total:
+            continue
+        directory = os.path.join(data_dir, collection_name)
+        os.makedirs(directory, exist_ok=True)
+        for old in glob.glob(os.path.join(directory, 'part-*.jsonl')):
+            os.remove(old)  # shards of a previous (bigger) run
+        for shard, start in enumerate(range(0, total, shard_size)):
+            jobs.append((collection_name, shard, start, min(start + shard_size, total)))
+
+    generated = dict.fromkeys(counts, 0)
+    began = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(write_shard, *job, spec, data_dir) for job in jobs]
+        for future in as_completed(futures):
+            collection_name, documents, seconds = future.result()
+            generated[collection_name] += documents
+            print(f"{collection_name}: +{documents:,} in {seconds:.1f}s "
+                  f"({generated[collection_name]:,}/{counts[collection_name]:,})")
+
+    elapsed = time.perf_counter() - began
+    total = sum(generated.values())
+    print(f"\n{total:,} documents in {elapsed:.1f}s ({total / elapsed if elapsed else 0:,.0f} docs/sec)")
+    return generated
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic JSONL datasets for insert_data')
+    parser.add_argument('--users', type=int, default=50_003)
+    parser.add_argument('--products', type=int, default=5_000)
+    parser.add_argument('--posts', type=int, default=2_000)
+    parser.add_argument('--comments', type=int, default=100_000)
+    parser.add_argument('--orders', type=int, default=20_000)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE, help='documents per JSONL shard')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='shards generated at the same time')
+    args = parser.parse_args()
+
+    counts = {name: getattr(args, name) for name in COLLECTIONS}
+    generate(counts, args.seed, args.data_dir, args.shard_size, args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,30 +1,250 @@
 import pymongo
-from bson import json_util 
-import os
+from pymongo.errors import BulkWriteError, OperationFailure
+from bson import json_util
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+import argparse
+import glob
+import json
+import os
+import threading
+import time
+from app.indexes import INDEXES, ensure_indexes
+
+'''
+--LOAD DATABASE--
+
+docker compose exec api python -m insert_data
+docker compose exec api python -m insert_data --chunk-size 5000 --workers 8 --collections users posts
+
+Streams every data file of each collection into MongoDB:
+- data/<collection>.json            JSON array (Extended JSON), parsed incrementally
+- data/<collection>.jsonl           one document per line
+- data/<collection>/*.jsonl         shards (python -m generate_data)
+
+Documents are inserted in ordered=False chunks of --chunk-size and the files are
+loaded concurrently on a thread pool. The API creates the indexes at startup, so the
+secondary indexes of app/indexes.py (all but the unique ones, which keep guarding
+duplicates) are dropped before the load and rebuilt after it (--keep-indexes to skip).
+Listings and searches of the API are slower while the load runs.
+Progress is saved in a checkpoint file after every chunk: if the load fails,
+running it again skips the documents already inserted (--reset starts over).
+'''
 
 # Configuration
 MONGO_URI = os.getenv('MONGO_URI')
 DB_NAME = os.getenv('MONGO_DB_NAME')
 
-def load_collection(db, collection_name, filename):
+COLLECTIONS = ['users', 'products', 'posts', 'comments', 'orders']
+DATA_DIR = 'data'
+CHUNK_SIZE = 1000
+WORKERS = 4
+READ_SIZE = 1 << 20  # bytes read at a time from JSON arrays
+
+_decoder = json.JSONDecoder(object_hook=json_util.object_hook)
+
+
+# ==================== PARSING ====================
+
+def iter_json_array(path):
+    """Documents of a JSON array file, decoded one by one (memory bounded by READ_SIZE)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        pos = 0
+        started = False
+        eof = False
+
+        while True:
+            # skip whitespace and separators
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if not started and pos < len(buffer):
+                if buffer[pos] != '[':
+                    raise ValueError(f"{path}: expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+
+            try:
+                document, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # incomplete document at the end of the buffer: read more
+                if eof:
+                    if buffer[pos:].strip():
+                        raise
+                    return
+                chunk = f.read(READ_SIZE)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+
+            yield document
+            pos = end
+
+
+def iter_jsonl(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json_util.loads(line)
+
+
+def iter_documents(path):
+    return iter_jsonl(path) if path.endswith('.jsonl') else iter_json_array(path)
+
+
+def data_files(data_dir, collection_name):
+    """Every file of a collection: single JSON/JSONL file and/or JSONL shards"""
+    patterns = [
+        f"{collection_name}.json",
+        f"{collection_name}.jsonl",
+        os.path.join(collection_name, '*.jsonl'),
+    ]
+    return sorted(
+        path for pattern in patterns for path in glob.glob(os.path.join(data_dir, pattern))
+    )
+
+
+# ==================== CHECKPOINT ====================
+
+class Checkpoint:
+    """Documents already inserted per file, saved as JSON after every chunk"""
+
+    def __init__(self, path, reset=False):
+        self.path = path
+        self.done = {}
+        self._lock = threading.Lock()
+        if not reset and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.done = json.load(f)
+
+    def get(self, key):
+        return self.done.get(key, 0)
+
+    def set(self, key, count):
+        with self._lock:
+            self.done[key] = count
+            tmp = f"{self.path}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.done, f)
+            os.replace(tmp, self.path)  # atomic: never a half written checkpoint
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# ==================== LOAD ====================
+
+def drop_secondary_indexes(db, collections):
+    """Drop the registered non-unique indexes so inserts don't update them one by one"""
+    for collection_name in collections:
+        for index in INDEXES.get(collection_name, []):
+            if index.document.get('unique'):
+                continue
+            try:
+                db[collection_name].drop_index(index.document['name'])
+                print(f"{collection_name}: index {index.document['name']} dropped until the end of the load")
+            except OperationFailure:
+                pass  # not created yet
+
+
+def insert_chunk(collection, documents):
+    """insert_many ordered=False; documents already inserted (resumed chunk) are skipped"""
+    try:
+        return len(collection.insert_many(documents, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        if any(error['code'] != 11000 for error in e.details['writeErrors']):
+            raise
+        return e.details['nInserted']
+
+
+def load_file(db, collection_name, path, checkpoint, chunk_size=CHUNK_SIZE):
+    """Stream one file into its collection. Returns (inserted, seconds)"""
+    start = time.perf_counter()
+    key = f"{collection_name}:{os.path.basename(path)}"
+    skip = checkpoint.get(key)
+    position = 0
+    inserted = 0
+    chunk = []
+
+    for document in iter_documents(path):
+        position += 1
+        if position <= skip:
+            continue  # inserted by a previous run
+        chunk.append(document)
+        if len(chunk) >= chunk_size:
+            inserted += insert_chunk(db[collection_name], chunk)
+            checkpoint.set(key, position)
+            chunk = []
+
+    if chunk:
+        inserted += insert_chunk(db[collection_name], chunk)
+        checkpoint.set(key, position)
+
+    elapsed = time.perf_counter() - start
+    resumed = f" (resumed after {skip:,})" if skip else ""
+    print(f"{key}: {inserted:,} documents inserted{resumed} in {elapsed:.1f}s "
+          f"({inserted / elapsed if elapsed else 0:,.0f} docs/sec)")
+    return inserted, elapsed
+
+
+def load(db, collections=COLLECTIONS, data_dir=DATA_DIR, chunk_size=CHUNK_SIZE,
+         workers=WORKERS, reset=False, keep_indexes=False):
+    checkpoint = Checkpoint(os.path.join(data_dir, '.insert_checkpoint.json'), reset)
+
+    jobs = [
+        (collection_name, path)
+        for collection_name in collections
+        for path in data_files(data_dir, collection_name)
+    ]
+    if not jobs:
+        print(f"No data files found in {data_dir}")
+        return 0
+
+    loaded = [c for c in collections if c in {c for c, _ in jobs}]
+    if not keep_indexes:
+        drop_secondary_indexes(db, loaded)
+
+    total = 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(load_file, db, collection_name, path, checkpoint, chunk_size)
+                for collection_name, path in jobs
+            ]
+            for future in as_completed(futures):
+                inserted, _ = future.result()  # a failed file stops the load (checkpoint kept)
+                total += inserted
+    finally:
+        # Indexes after the load: one build per index instead of updating them on every insert
+        # (also when the load fails, so the API is not left without them)
+        print("\nCreating indexes...")
+        ensure_indexes(db, loaded)
+
+    checkpoint.remove()
+    return total
 
-    print(f"\nLoading {collection_name}...")
-    with open(filename, 'r', encoding='utf-8') as f:
-        data = json_util.loads(f.read())
-    
-    if data:
-        db[collection_name].insert_many(data)
-        print(f"{len(data):,} documents inserted")
-    else:
-        print(f"No data found in {filename}")
 
 def main():
+    parser = argparse.ArgumentParser(description='Load the data files into MongoDB')
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--collections', nargs='+', default=COLLECTIONS)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='documents per insert_many')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='files loaded at the same time')
+    parser.add_argument('--reset', action='store_true', help='ignore the checkpoint of a previous run')
+    parser.add_argument('--keep-indexes', action='store_true',
+                        help='do not drop the secondary indexes during the load')
+    args = parser.parse_args()
+
     print(f"LOAD DATABASE FROM JSON FILES")
-    
+
     print(f"MongoDB: {MONGO_URI}")
     print(f"DB: {DB_NAME}")
-    
+
     # Connect
     try:
         client = pymongo.MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
@@ -34,17 +254,15 @@ def main():
     except Exception as e:
         print(f"\n✗ Error: {e}")
         return
-    
+
     start = datetime.now()
-    
-    # Load all collections
-    load_collection(db, 'users', 'data/users.json')
-    load_collection(db, 'products', 'data/products.json')
-    load_collection(db, 'posts', 'data/posts.json')
-    load_collection(db, 'comments', 'data/comments.json')
-    
+
+    total = load(db, args.collections, args.data_dir, args.chunk_size, args.workers, args.reset,
+                 args.keep_indexes)
+
     duration = (datetime.now() - start).total_seconds()
-    
+
+    print(f"{total:,} documents ({total / duration if duration else 0:,.0f} docs/sec)")
     print(f"COMPLETED IN {duration:.1f}s")
 
 if __name__ == "__main__":
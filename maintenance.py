@@ -0,0 +1,307 @@
+import argparse
+from datetime import datetime, timezone
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from bson import ObjectId
+from app.extensions import init_db
+from app.indexes import ensure_indexes
+
+'''
+--MAINTENANCE JOBS--
+
+docker compose exec api python -m maintenance likes            # move liked_by_users arrays into the likes collection, recount likes
+docker compose exec api python -m maintenance products-search  # fill brand_lower / search_specs of existing products
+docker compose exec api python -m maintenance ratings          # rebuild rating_sum / total_ratings / average_rating
+docker compose exec api python -m maintenance carts            # move users.cart into the carts collection
+docker compose exec api python -m maintenance comments         # rebuild total_comments / recent comments of posts and products
+'''
+
+def _insert_ignoring_duplicates(collection, operations):
+    """bulk insert where already existing documents (unique index) are skipped"""
+    if not operations:
+        return 0
+    try:
+        return collection.bulk_write(operations, ordered=False).inserted_count
+    except BulkWriteError as e:
+        if any(error['code'] != 11000 for error in e.details['writeErrors']):
+            raise
+        return e.details['nInserted']
+
+
+# ==================== LIKES ====================
+
+def migrate_likes(db, batch_size=1000):
+    """
+    Move the legacy liked_by_users arrays of posts and comments into the likes
+    collection, recount the likes counter and remove the arrays
+    """
+    ensure_indexes(db, ['likes'])
+
+    for entity_type, collection_name in (('post', 'posts'), ('comment', 'comments')):
+        collection = db[collection_name]
+        migrated = 0
+        inserted = 0
+
+        cursor = collection.find(
+            {'liked_by_users': {'$exists': True}},
+            {'liked_by_users': 1}
+        ).batch_size(batch_size)
+
+        for entity in cursor:
+            entity_id = str(entity['_id'])
+            operations = [
+                InsertOne({
+                    'entity_type': entity_type,
+                    'entity_id': entity_id,
+                    'user_id': user_id,
+                    'date': datetime.now(timezone.utc)
+                })
+                for user_id in set(entity.get('liked_by_users') or [])
+            ]
+            inserted += _insert_ignoring_duplicates(db.likes, operations)
+
+            total = db.likes.count_documents({'entity_type': entity_type, 'entity_id': entity_id})
+            collection.update_one(
+                {'_id': entity['_id']},
+                {'$set': {'likes': total}, '$unset': {'liked_by_users': ''}}
+            )
+            migrated += 1
+
+        print(f"{collection_name}: {migrated:,} documents migrated, {inserted:,} likes inserted")
+
+    recount_likes(db, batch_size)
+
+
+def recount_likes(db, batch_size=1000):
+    """
+    Rebuild the likes counter of every post and comment from the likes collection
+    (repairs a toggle that died between the like and the $inc). Entities
+    without likes are reset to 0
+    """
+    for entity_type, collection_name in (('post', 'posts'), ('comment', 'comments')):
+        collection = db[collection_name]
+        pipeline = [
+            {'$match': {'entity_type': entity_type}},
+            {'$group': {'_id': '$entity_id', 'total': {'$sum': 1}}}
+        ]
+
+        liked = []
+        updated = 0
+        operations = []
+
+        for group in db.likes.aggregate(pipeline, allowDiskUse=True):
+            if not ObjectId.is_valid(group['_id']):
+                continue
+            entity_id = ObjectId(group['_id'])
+            liked.append(entity_id)
+            operations.append(UpdateOne({'_id': entity_id}, {'$set': {'likes': group['total']}}))
+            if len(operations) >= batch_size:
+                updated += collection.bulk_write(operations, ordered=False).modified_count
+                operations = []
+
+        if operations:
+            updated += collection.bulk_write(operations, ordered=False).modified_count
+
+        reset = collection.update_many(
+            {'_id': {'$nin': liked}, 'likes': {'$ne': 0}},
+            {'$set': {'likes': 0}}
+        ).modified_count
+
+        print(f"{collection_name}: {len(liked):,} liked, {updated:,} recounted, {reset:,} reset")
+
+
+# ==================== PRODUCT SEARCH ====================
+
+def backfill_product_search(db, batch_size=1000):
+    """Compute the derived search fields (brand_lower, search_specs) of every product"""
+    from app.routes.products import product_search_fields
+
+    updated = 0
+    operations = []
+    cursor = db.products.find({}, {'brand': 1, 'specifications': 1}).batch_size(batch_size)
+
+    for product in cursor:
+        operations.append(UpdateOne({'_id': product['_id']}, {'$set': product_search_fields(product)}))
+        if len(operations) >= batch_size:
+            updated += db.products.bulk_write(operations, ordered=False).modified_count
+            operations = []
+
+    if operations:
+        updated += db.products.bulk_write(operations, ordered=False).modified_count
+
+    ensure_indexes(db, ['products'])
+    print(f"products: {updated:,} documents updated")
+
+
+# ==================== RATINGS ====================
+
+def reconcile_ratings(db, batch_size=1000):
+    """
+    Rebuild the exact rating counters of every product from its comments
+    (one aggregation for all products + bulk updates). Products without
+    rated comments are reset to 0 / None
+    """
+    pipeline = [
+        {'$match': {'entity_type': 'product', 'rating': {'$ne': None}}},
+        {'$group': {'_id': '$entity_id', 'sum': {'$sum': '$rating'}, 'total': {'$sum': 1}}}
+    ]
+
+    rated = []
+    updated = 0
+    operations = []
+
+    for group in db.comments.aggregate(pipeline, allowDiskUse=True):
+        if not ObjectId.is_valid(group['_id']):
+            continue
+        product_id = ObjectId(group['_id'])
+        rated.append(product_id)
+        operations.append(UpdateOne({'_id': product_id}, {'$set': {
+            'rating_sum': group['sum'],
+            'total_ratings': group['total'],
+            'average_rating': round(group['sum'] / group['total'], 2)
+        }}))
+        if len(operations) >= batch_size:
+            updated += db.products.bulk_write(operations, ordered=False).modified_count
+            operations = []
+
+    if operations:
+        updated += db.products.bulk_write(operations, ordered=False).modified_count
+
+    reset = db.products.update_many(
+        {'_id': {'$nin': rated}},
+        {'$set': {'rating_sum': 0, 'total_ratings': 0, 'average_rating': None}}
+    ).modified_count
+
+    print(f"products: {len(rated):,} rated, {updated:,} updated, {reset:,} reset")
+
+
+# ==================== COMMENT COUNTERS ====================
+
+COMMENT_ENTITIES = {'post': 'posts', 'product': 'products'}
+
+
+def rebuild_comment_counters(db, batch_size=1000):
+    """
+    Rebuild total_comments and the recent comments cache (5 newest main comments,
+    shaped like LastComment) of every post and product from the comments collection.
+    Entities without comments are reset to 0 / []
+    """
+    from app.routes.comments import RECENT_COMMENTS
+
+    totals = {
+        (group['_id']['type'], group['_id']['id']): group['total']
+        for group in db.comments.aggregate([
+            {'$group': {'_id': {'type': '$entity_type', 'id': '$entity_id'}, 'total': {'$sum': 1}}}
+        ], allowDiskUse=True)
+    }
+    recent = {
+        (group['_id']['type'], group['_id']['id']): group['comments']
+        for group in db.comments.aggregate([
+            {'$match': {'reply_to': None}},
+            {'$group': {
+                '_id': {'type': '$entity_type', 'id': '$entity_id'},
+                'comments': {'$topN': {
+                    'n': RECENT_COMMENTS,
+                    'sortBy': {'date': -1},
+                    'output': {
+                        'id': {'$toString': '$_id'},
+                        'user_id': '$user_id',
+                        'user_name': '$user_name',
+                        'text': '$text',
+                        'date': '$date',
+                        'likes': '$likes',
+                        'additional_file': '$additional_file',
+                        'rating': '$rating'
+                    }
+                }}
+            }}
+        ], allowDiskUse=True)
+    }
+
+    for entity_type, collection_name in COMMENT_ENTITIES.items():
+        collection = db[collection_name]
+        updated = 0
+        seen = []
+        operations = []
+
+        for (group_type, entity_id), total in totals.items():
+            if group_type != entity_type or not ObjectId.is_valid(entity_id):
+                continue
+            seen.append(ObjectId(entity_id))
+            operations.append(UpdateOne({'_id': ObjectId(entity_id)}, {'$set': {
+                'total_comments': total,
+                'comments': recent.get((entity_type, entity_id), [])
+            }}))
+            if len(operations) >= batch_size:
+                updated += collection.bulk_write(operations, ordered=False).modified_count
+                operations = []
+
+        if operations:
+            updated += collection.bulk_write(operations, ordered=False).modified_count
+
+        reset = collection.update_many(
+            {'_id': {'$nin': seen}},
+            {'$set': {'total_comments': 0, 'comments': []}}
+        ).modified_count
+
+        print(f"{collection_name}: {len(seen):,} with comments, {updated:,} updated, {reset:,} reset")
+
+
+# ==================== CARTS ====================
+
+def migrate_carts(db, batch_size=1000):
+    """
+    Move the cart array of every user into its own carts document
+    ({_id: user _id, items}) and remove it from the profile.
+    Safe to run again: carts are upserted by user id
+    """
+    migrated = 0
+    operations = []
+    user_ids = []
+    cursor = db.users.find({'cart': {'$exists': True}}, {'cart': 1}).batch_size(batch_size)
+
+    def flush():
+        if operations:
+            db.carts.bulk_write(operations, ordered=False)
+            db.users.update_many({'_id': {'$in': user_ids}}, {'$unset': {'cart': ''}})
+
+    for user in cursor:
+        operations.append(UpdateOne(
+            {'_id': user['_id']},
+            {'$set': {'items': user.get('cart') or [], 'updated_at': datetime.now(timezone.utc)}},
+            upsert=True
+        ))
+        user_ids.append(user['_id'])
+        if len(operations) >= batch_size:
+            flush()
+            migrated += len(operations)
+            operations = []
+            user_ids = []
+
+    flush()
+    migrated += len(operations)
+    print(f"users: {migrated:,} carts migrated")
+
+
+COMMANDS = {
+    'likes': migrate_likes,
+    'products-search': backfill_product_search,
+    'ratings': reconcile_ratings,
+    'carts': migrate_carts,
+    'comments': rebuild_comment_counters,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintenance jobs')
+    parser.add_argument('command', choices=list(COMMANDS))
+    args = parser.parse_args()
+
+    db, mongo_client = init_db()
+    start = datetime.now()
+    COMMANDS[args.command](db)
+    print(f"COMPLETED IN {(datetime.now() - start).total_seconds():.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,15 @@
 from app import create_app #__init__.py toma el nombre de la carpeta que lo contiene.
-
-app = create_app()
+import signal
+import sys
 
 if __name__ == '__main__':
+    # SIGTERM (docker compose stop, somos el PID 1) sale con sys.exit para que se
+    # ejecuten los atexit: flush final de las visitas y cierre del pool de hashing
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    # Dentro del guard: los procesos spawn (pool de hashing) reimportan este módulo
+    # y no deben crear otra app (cliente Mongo, índices, hilos)
+    app = create_app()
     app.run(
         host='0.0.0.0',
         port=5000,